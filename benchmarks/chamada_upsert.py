@@ -0,0 +1,76 @@
+"""
+Compara o salvamento da chamada: laço antigo (SELECT + UPDATE/INSERT por
+membro) contra o upsert em lote de pgs.chamadas.upsert_chamadas.
+
+Roda sobre uma tabela temporária com a mesma estrutura de `chamadas`, sem
+tocar nos dados reais. Mede a primeira gravação (inserções) e a regravação
+(atualizações).
+
+Uso: python -m benchmarks.chamada_upsert [membros_por_unidade]
+"""
+import sys
+import time
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, UniqueConstraint, select, insert, update
+from sqlalchemy.orm import Session
+
+from pgs.db import engine
+from pgs.chamadas import upsert_chamadas
+
+metadata = MetaData()
+chamadas_bench = Table(
+    "chamadas_bench", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("reuniao_id", Integer), Column("id_unidade", Integer), Column("membro", String),
+    Column("presenca", Integer), Column("pontualidade", Integer),
+    Column("uniforme", Integer), Column("modestia", Integer),
+    UniqueConstraint("reuniao_id", "id_unidade", "membro"),
+    prefixes=["TEMPORARY"],
+)
+
+
+def laco_antigo(session, chamadas, registros):
+    for r in registros:
+        chamada_existente = session.execute(
+            select(chamadas.c.id)
+            .where(chamadas.c.reuniao_id == r[0])
+            .where(chamadas.c.id_unidade == r[1])
+            .where(chamadas.c.membro == r[2])
+        ).fetchone()
+
+        if chamada_existente:
+            stmt = update(chamadas).where(chamadas.c.id == chamada_existente[0]).values(
+                presenca=r[3], pontualidade=r[4], uniforme=r[5], modestia=r[6]
+            )
+        else:
+            stmt = insert(chamadas).values(
+                reuniao_id=r[0], id_unidade=r[1], membro=r[2], presenca=r[3],
+                pontualidade=r[4], uniforme=r[5], modestia=r[6]
+            )
+
+        session.execute(stmt)
+
+
+def medir(funcao, registros):
+    with Session(engine) as session:
+        metadata.create_all(session.connection())
+        tempos = []
+        for _ in range(2):  # 1ª passada insere, 2ª atualiza
+            inicio = time.perf_counter()
+            funcao(session, chamadas_bench, registros)
+            session.flush()
+            tempos.append(time.perf_counter() - inicio)
+        session.rollback()
+    return tempos
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    registros = [(1, 1, f"Membro {i}", 10, 10, 10, 10) for i in range(n)]
+
+    antigo = medir(laco_antigo, registros)
+    novo = medir(upsert_chamadas, registros)
+
+    print(f"{n} membros          inserção     atualização")
+    print(f"Laço antigo     {antigo[0] * 1000:9.1f} ms {antigo[1] * 1000:12.1f} ms")
+    print(f"Upsert em lote  {novo[0] * 1000:9.1f} ms {novo[1] * 1000:12.1f} ms")
@@ -0,0 +1,74 @@
+"""
+Compara os formatos de exportação de pgs.exportacao (Excel, CSV.gz e Parquet)
+em tempo, tamanho do arquivo e pico de memória, contra o caminho antigo
+(fetchall + DataFrame + Excel em memória).
+
+Os dados são um "Fluxo de Caixa" sintético gerado pelo próprio PostgreSQL com
+generate_series, sem criar tabelas; o script só roda em PostgreSQL. O pico de
+memória é medido com tracemalloc, que também deixa os tempos mais lentos.
+
+Uso: python -m benchmarks.formatos_exportacao [linhas]
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from sqlalchemy import text, column, Date, String, Numeric, Integer
+
+from pgs.db import engine
+from pgs.exportacao import FORMATOS, remover_arquivo
+
+COLUNAS = ["data", "tipo", "descricao", "valor", "id_evento"]
+
+
+def consulta_sintetica(linhas):
+    return text("""
+        SELECT DATE '2015-01-01' + (i % 3650) AS data,
+               CASE WHEN i % 3 = 0 THEN 'Saída' ELSE 'Entrada' END AS tipo,
+               'Lançamento ' || i AS descricao,
+               round((random() * 500)::numeric, 2)::numeric(10, 2) AS valor,
+               NULLIF(i % 20, 0) AS id_evento
+        FROM generate_series(1, :linhas) AS i
+    """).bindparams(linhas=linhas).columns(
+        column("data", Date), column("tipo", String), column("descricao", String),
+        column("valor", Numeric(10, 2)), column("id_evento", Integer),
+    )
+
+
+def excel_em_memoria(stmt, colunas):
+    """Caminho antigo de pgs.extracao: tudo em memória antes do download."""
+    with engine.connect() as conn:
+        df = pd.DataFrame(conn.execute(stmt).fetchall(), columns=colunas)
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False, sheet_name="Relatório")
+    return output.getvalue()
+
+
+def medir(funcao):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resultado, duracao, pico
+
+
+if __name__ == '__main__':
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    stmt = consulta_sintetica(linhas)
+
+    print(f"{linhas} linhas sintéticas de Fluxo de Caixa\n")
+    print(f"{'Formato':<28}{'Tempo (s)':>10}{'Tamanho (MB)':>14}{'Pico de memória (MB)':>22}")
+
+    dados, duracao, pico = medir(lambda: excel_em_memoria(stmt, COLUNAS))
+    print(f"{'Excel em memória (antigo)':<28}{duracao:>10.2f}{len(dados) / 1e6:>14.2f}{pico / 1e6:>22.1f}")
+
+    for nome, (exportar, _, _) in FORMATOS.items():
+        (arquivo, _), duracao, pico = medir(lambda: exportar(stmt, COLUNAS))
+        print(f"{nome:<28}{duracao:>10.2f}{os.path.getsize(arquivo) / 1e6:>14.2f}{pico / 1e6:>22.1f}")
+        remover_arquivo(arquivo)
@@ -0,0 +1,83 @@
+"""
+Compara o preenchimento das etiquetas de utils.ppt: uma chamada de
+replace_text(..., how='first') por valor (cada uma varre os slides desde o
+início) contra fill_placeholders, que indexa os espaços uma vez só.
+
+O modelo é gerado em memória com python-pptx: slides com 11 etiquetas, cada
+uma com os parágrafos {nome} e {unidade}, como o etiquetas.pptx. Os dois
+caminhos devem produzir exatamente o mesmo texto.
+
+O laço antigo é quadrático (cerca de 1 min com 1.000 etiquetas), então acima
+de LIMITE_ANTIGO só roda com --completo.
+
+Uso: python -m benchmarks.ppt_etiquetas [--completo] [etiquetas ...]
+"""
+import sys
+import time
+
+from pptx import Presentation
+from pptx.util import Cm
+
+from utils import ppt as ppt_utils
+
+ETIQUETAS_PADRAO = [100, 1000, 5000]
+POR_SLIDE = 11
+LIMITE_ANTIGO = 1000
+
+
+def modelo(etiquetas):
+    apresentacao = Presentation()
+    layout = apresentacao.slide_layouts[6]  # Em branco
+
+    for inicio in range(0, etiquetas, POR_SLIDE):
+        slide = apresentacao.slides.add_slide(layout)
+        for i in range(min(POR_SLIDE, etiquetas - inicio)):
+            caixa = slide.shapes.add_textbox(Cm(1), Cm(1 + i * 1.5), Cm(10), Cm(1.5))
+            caixa.text_frame.text = "{nome}"
+            caixa.text_frame.add_paragraph().text = "{unidade}"
+
+    return apresentacao
+
+
+def pares(etiquetas):
+    resultado = []
+    for i in range(etiquetas):
+        resultado.append(("{nome}", f"Desbravador {i}"))
+        resultado.append(("{unidade}", f"Unidade {i % 12}"))
+    return resultado
+
+
+def laco_antigo(apresentacao, lista):
+    for search_string, replace_string in lista:
+        apresentacao = ppt_utils.replace_text(apresentacao, search_string, replace_string, how='first')
+    return apresentacao
+
+
+def textos(apresentacao):
+    return [shape.text_frame.text for slide in apresentacao.slides for shape in slide.shapes]
+
+
+def medir(funcao, etiquetas):
+    apresentacao = modelo(etiquetas)
+    inicio = time.perf_counter()
+    apresentacao = funcao(apresentacao, pares(etiquetas))
+    return time.perf_counter() - inicio, textos(apresentacao)
+
+
+if __name__ == '__main__':
+    ppt_utils.DEBUG = False
+    completo = "--completo" in sys.argv
+    tamanhos = [int(n) for n in sys.argv[1:] if n != "--completo"] or ETIQUETAS_PADRAO
+
+    print(f"{'Etiquetas':>10}{'Slides':>8}{'replace_text (s)':>18}{'fill_placeholders (s)':>23}{'Ganho':>8}")
+    for etiquetas in tamanhos:
+        slides = -(-etiquetas // POR_SLIDE)
+        tempo_novo, texto_novo = medir(ppt_utils.fill_placeholders, etiquetas)
+
+        if etiquetas > LIMITE_ANTIGO and not completo:
+            print(f"{etiquetas:>10}{slides:>8}{'-':>18}{tempo_novo:>23.3f}{'-':>8}")
+            continue
+
+        tempo_antigo, texto_antigo = medir(laco_antigo, etiquetas)
+        assert texto_antigo == texto_novo, "Os dois caminhos produziram etiquetas diferentes"
+        print(f"{etiquetas:>10}{slides:>8}{tempo_antigo:>18.2f}{tempo_novo:>23.3f}{tempo_antigo / tempo_novo:>7.0f}x")
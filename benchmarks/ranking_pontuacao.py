@@ -0,0 +1,85 @@
+"""
+Compara o cálculo da pontuação: laço antigo (máscara por unidade e por mês)
+contra pgs.pontuacao.calcular_pontuacao (uma agregação agrupada), sobre um
+conjunto sintético de várias temporadas de chamadas. O laço antigo aqui já
+separa os meses por ano, como a versão nova, para que os dois produzam o
+mesmo resultado; a comparação é verificada antes de medir.
+
+Uso: python -m benchmarks.ranking_pontuacao [temporadas] [unidades] [membros_por_unidade]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from pgs.pontuacao import calcular_pontuacao, METRICAS
+
+
+def gerar_chamadas(temporadas, unidades, membros):
+    rng = np.random.default_rng(42)
+    datas = pd.date_range("2020-01-01", periods=temporadas * 52, freq="W-SUN")  # uma reunião por semana
+    n = len(datas) * unidades * membros
+
+    df = pd.DataFrame({
+        "Data": np.repeat(datas, unidades * membros),
+        "Unidade_Nome": np.tile(np.repeat([f"Unidade {u}" for u in range(unidades)], membros), len(datas)),
+    })
+    for metrica in METRICAS:
+        df[metrica] = rng.choice([0, 5, 10], size=n)
+
+    df["Ano"] = df["Data"].dt.year
+    df["Mes"] = df["Data"].dt.month
+    return df
+
+
+def laco_antigo(df):
+    ranking = df.groupby("Unidade_Nome")[METRICAS].sum()
+    ranking["Total_Geral"] = ranking.sum(axis=1)
+    ranking = ranking.sort_values(by="Total_Geral", ascending=False)
+
+    resultado = {}
+    for unidade in df["Unidade_Nome"].unique():
+        df_unidade = df[df["Unidade_Nome"] == unidade]
+        totais = [df_unidade[m].sum() for m in METRICAS]
+        resultado[unidade] = {}
+        meses = df_unidade[["Ano", "Mes"]].drop_duplicates().itertuples(index=False)
+        for ano, mes in sorted(meses, reverse=True):
+            df_mes = df_unidade[(df_unidade["Ano"] == ano) & (df_unidade["Mes"] == mes)]
+            resultado[unidade][(ano, mes)] = [df_mes[m].sum() for m in METRICAS]
+    return ranking, resultado
+
+
+def comparar(antigo, novo):
+    ranking_antigo, mensal_antigo = antigo
+    ranking_novo, mensal_novo = novo
+
+    assert ranking_antigo.to_dict() == ranking_novo.to_dict(), "Rankings diferentes"
+    assert list(ranking_antigo.index) == list(ranking_novo.index), "Ordem do ranking diferente"
+    mensal = {}
+    for (unidade, ano, mes), linha in mensal_novo[METRICAS].iterrows():
+        mensal.setdefault(unidade, {})[(ano, mes)] = list(linha)
+    assert mensal_antigo == mensal, "Totais mensais diferentes"
+
+
+def medir(funcao, df, repeticoes=3):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(df)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+if __name__ == '__main__':
+    args = [int(x) for x in sys.argv[1:4]]
+    temporadas, unidades, membros = args + [3, 8, 10][len(args):]
+    df = gerar_chamadas(temporadas, unidades, membros)
+    comparar(laco_antigo(df), calcular_pontuacao(df))
+
+    antigo = medir(laco_antigo, df)
+    novo = medir(calcular_pontuacao, df)
+
+    print(f"{len(df):,} chamadas, {temporadas} temporadas, {unidades} unidades")
+    print(f"Laço antigo              {antigo * 1000:9.1f} ms")
+    print(f"Agregação agrupada       {novo * 1000:9.1f} ms  ({antigo / novo:.1f}x)")
@@ -0,0 +1,51 @@
+"""
+Mede o custo de inicialização do esquema no pgs.db.
+
+Compara a reflexão antiga (metadata.reflect + um Table(autoload_with) por
+tabela) com a reflexão sob demanda a frio (sem cache em disco) e a quente
+(com o arquivo de cache já gravado).
+
+Uso: python -m benchmarks.reflexao_esquema [tabela ...]
+"""
+import sys
+import tempfile
+import time
+
+from sqlalchemy import MetaData, Table
+
+from pgs.db import engine, TabelasLazy
+
+TABELAS_PADRAO = ["membros", "unidades", "reunioes", "chamadas"]
+
+
+def reflexao_antiga():
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+    return {nome: Table(nome, metadata, autoload_with=engine) for nome in metadata.tables.keys()}
+
+
+def reflexao_lazy(diretorio, nomes):
+    tabelas = TabelasLazy(engine, diretorio)
+    for nome in nomes:
+        tabelas.get(nome)
+    return tabelas
+
+
+def medir(descricao, funcao, *args):
+    engine.dispose()  # cada medição começa sem conexões abertas, como um worker novo
+    inicio = time.perf_counter()
+    funcao(*args)
+    tempo = time.perf_counter() - inicio
+    print(f"{descricao:<35} {tempo * 1000:9.1f} ms")
+    return tempo
+
+
+if __name__ == '__main__':
+    nomes = sys.argv[1:] or TABELAS_PADRAO
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        antiga = medir("Reflexão completa (antiga)", reflexao_antiga)
+        fria = medir("Sob demanda, sem cache", reflexao_lazy, diretorio, nomes)
+        quente = medir("Sob demanda, com cache em disco", reflexao_lazy, diretorio, nomes)
+
+    print(f"\nGanho a quente: {antiga / quente:.1f}x mais rápido que a reflexão completa")
@@ -0,0 +1,124 @@
+"""
+Comandos de manutenção do banco de dados.
+
+Uso:
+    python manutencao.py migrar
+    python manutencao.py reconstruir-pontuacao
+    python manutencao.py fechar-meses
+    python manutencao.py conferir-livro
+"""
+import os
+import sys
+import glob
+import argparse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from pgs.db import engine, tables
+
+DIRETORIO_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql")
+
+
+def migrar():
+    """Aplica, em ordem, os arquivos de sql/ que ainda não foram aplicados."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS schema_migracoes ("
+            "nome TEXT PRIMARY KEY, aplicada_em TIMESTAMP NOT NULL DEFAULT now())"
+        )
+        aplicadas = set(conn.execute(text("SELECT nome FROM schema_migracoes")).scalars())
+
+    for arquivo in sorted(glob.glob(os.path.join(DIRETORIO_SQL, "*.sql"))):
+        nome = os.path.basename(arquivo)
+        if nome in aplicadas:
+            continue
+
+        with open(arquivo, encoding="utf-8") as f:
+            script = f.read()
+
+        # Cada migração roda em sua própria transação
+        with engine.begin() as conn:
+            conn.exec_driver_sql(script)
+            conn.execute(text("INSERT INTO schema_migracoes (nome) VALUES (:nome)"), {"nome": nome})
+
+        print(f"✅ Migração aplicada: {nome}")
+
+    # O esquema mudou: descarta o cache de reflexão
+    tables.limpar_cache()
+
+
+def reconstruir_pontuacao():
+    """Refaz a tabela pontuacao_resumo a partir de todo o histórico de chamadas."""
+    from pgs.pontuacao import recalcular_resumo
+
+    with Session(engine) as session:
+        recalcular_resumo(session)
+        session.commit()
+
+    print("✅ Resumo de pontuação reconstruído.")
+
+
+def fechar_meses():
+    """Fecha, em uma única instrução, todos os meses anteriores ao atual que ainda não têm fechamento."""
+    from pgs.livro_caixa import fechar_meses as fechar
+
+    with Session(engine) as session:
+        fechados = fechar(session)
+        session.commit()
+
+    print(f"✅ {fechados} meses fechados.")
+
+
+def conferir_livro():
+    """
+    Confere o livro caixa: para cada mês com lançamentos, compara os totais
+    de movimento_do_mes com uma soma direta do caixa agrupada por ano/mês e,
+    se o mês estiver fechado, com o fechamento gravado. Sai com código 1 se
+    algum mês divergir.
+    """
+    from sqlalchemy import select, func, extract
+    from pgs.livro_caixa import movimento_do_mes
+
+    caixa = tables.get("caixa")
+    fechamento = tables.get("fechamento")
+    ano, mes = extract("year", caixa.c.data), extract("month", caixa.c.data)
+
+    with Session(engine) as session:
+        meses = session.execute(
+            select(
+                ano, mes,
+                func.coalesce(func.sum(caixa.c.valor).filter(caixa.c.tipo == "Entrada"), 0),
+                func.coalesce(func.sum(caixa.c.valor).filter(caixa.c.tipo == "Saída"), 0),
+            ).group_by(ano, mes).order_by(ano, mes)
+        ).fetchall()
+        fechados = {(f.ano, f.mes): (f.entrada, f.saida) for f in session.execute(select(fechamento))}
+
+        divergentes = 0
+        for ano_mes, mes_mes, entrada, saida in meses:
+            periodo = (int(ano_mes), int(mes_mes))
+            calculado = movimento_do_mes(session, *periodo)
+            gravado = fechados.get(periodo, (entrada, saida))
+
+            if calculado != (entrada, saida) or gravado != (entrada, saida):
+                divergentes += 1
+                print(f"❌ {periodo[1]:02d}/{periodo[0]}: caixa {entrada}/{saida}, "
+                      f"movimento_do_mes {calculado[0]}/{calculado[1]}, fechamento {gravado[0]}/{gravado[1]}")
+
+    if divergentes:
+        print(f"⚠️ {divergentes} de {len(meses)} meses divergentes.")
+        sys.exit(1)
+    print(f"✅ {len(meses)} meses conferidos.")
+
+
+COMANDOS = {
+    "migrar": migrar,
+    "reconstruir-pontuacao": reconstruir_pontuacao,
+    "fechar-meses": fechar_meses,
+    "conferir-livro": conferir_livro,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manutenção do banco de dados do Pioneiros da Colina")
+    parser.add_argument("comando", choices=list(COMANDOS))
+    args = parser.parse_args()
+    COMANDOS[args.comando]()
@@ -3,6 +3,7 @@ import streamlit as st
 from sqlalchemy.orm import Session
 from sqlalchemy import select, insert, update, delete
 from pgs.db import engine, tables
+from pgs.cache import referencia, invalidar
 
 
 def criar_ata():
@@ -19,14 +20,13 @@ def criar_ata():
 
     st.subheader("📌 Criar Ata de Reunião")
 
-    with Session(engine) as session:
-        reunioes_query = session.execute(select(reunioes.c.id, reunioes.c.nome, reunioes.c.data)).fetchall()
+    reunioes_df = referencia("reunioes")
 
-    if not reunioes_query:
+    if reunioes_df.empty:
         st.warning("⚠️ Nenhuma reunião cadastrada.")
         return
 
-    reuniao_opcoes = {str(r.id): f"{r.nome} - {r.data}" for r in reunioes_query}
+    reuniao_opcoes = {str(r.id): f"{r.nome} - {r.data}" for r in reunioes_df.itertuples()}
     reuniao_selecionada = st.selectbox("Selecione a Reunião", list(reuniao_opcoes.values()), key="select_reuniao_ata")
     reuniao_id = next(r for r in reuniao_opcoes if reuniao_opcoes[r] == reuniao_selecionada)
 
@@ -37,6 +37,7 @@ def criar_ata():
         with Session(engine) as session:
             session.execute(insert(atas).values(reuniao_id=reuniao_id, titulo=titulo, descricao=descricao))
             session.commit()
+        invalidar("ata")
         st.success("✅ Ata registrada com sucesso!")
         st.rerun()
 
@@ -80,6 +81,7 @@ def gerenciar_atas():
             with Session(engine) as session:
                 session.execute(update(atas).where(atas.c.id == ata_id).values(titulo=novo_titulo, descricao=nova_descricao))
                 session.commit()
+            invalidar("ata")
             st.success("✅ Ata atualizada com sucesso!")
             st.rerun()
 
@@ -88,6 +90,7 @@ def gerenciar_atas():
             with Session(engine) as session:
                 session.execute(delete(atas).where(atas.c.id == ata_id))
                 session.commit()
+            invalidar("ata", "ato")  # Os atos da ata podem ter sido removidos junto
             st.warning("⚠️ Ata excluída!")
             st.rerun()
 
@@ -139,6 +142,7 @@ def criar_ato():
         with Session(engine) as session:
             session.execute(insert(atos).values(ata_id=ata_id, titulo=titulo_ato, descricao=descricao_ato, unidade_id=unidade_id))
             session.commit()
+        invalidar("ato")
         st.success("✅ Ato registrado com sucesso!")
         st.rerun()
 
@@ -182,6 +186,7 @@ def gerenciar_atos():
         with Session(engine) as session:
             session.execute(update(atos).where(atos.c.id == ato_id).values(titulo=novo_titulo, descricao=nova_descricao))
             session.commit()
+        invalidar("ato")
         st.success("✅ Ato atualizado!")
         st.rerun()
 
@@ -0,0 +1,71 @@
+import os
+import threading
+import pandas as pd
+import streamlit as st
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from pgs.db import engine, tables
+
+# **Tempo de vida (segundos) das tabelas de referência em cache**
+TTL_REFERENCIAS = int(os.getenv('CACHE_TTL_REFERENCIAS', '600'))
+
+# **Tabelas de referência compartilhadas entre todas as sessões**
+REFERENCIAS = ["unidades", "reunioes", "evento", "classe", "especialidades", "patrimonio", "membros"]
+
+_versoes = {}  # tabela -> versão dos dados; incrementada pelas rotinas de escrita
+_contadores = {}  # tabela -> {"chamadas": n, "misses": n}
+_lock = threading.Lock()
+
+
+def versao_dados(*nomes):
+    """Versão atual dos dados das tabelas informadas, para usar como chave de cache."""
+    with _lock:
+        return tuple(_versoes.get(nome, 0) for nome in nomes)
+
+
+def invalidar(*nomes):
+    """Deve ser chamada após gravar nas tabelas informadas: as próximas leituras vão ao banco."""
+    with _lock:
+        for nome in nomes:
+            _versoes[nome] = _versoes.get(nome, 0) + 1
+
+
+def _contar(nome, campo):
+    with _lock:
+        contador = _contadores.setdefault(nome, {"chamadas": 0, "misses": 0})
+        contador[campo] += 1
+
+
+@st.cache_data(ttl=TTL_REFERENCIAS, show_spinner=False, max_entries=100)
+def _consultar_referencia(nome, versao):
+    _contar(nome, "misses")
+
+    tabela = tables.get(nome)
+    if tabela is None:
+        return pd.DataFrame()
+
+    with Session(engine) as session:
+        result = session.execute(select(tabela).order_by(*tabela.primary_key.columns)).fetchall()
+
+    return pd.DataFrame(result, columns=tabela.columns.keys())
+
+
+def referencia(nome):
+    """
+    Retorna todas as linhas de uma tabela de referência como DataFrame.
+
+    O resultado é compartilhado entre as sessões e só volta ao banco quando o
+    TTL expira ou quando uma escrita chama `invalidar(nome)`.
+    """
+    _contar(nome, "chamadas")
+    return _consultar_referencia(nome, versao_dados(nome))
+
+
+def estatisticas_cache():
+    """Contadores de acertos e faltas do cache por tabela."""
+    with _lock:
+        return pd.DataFrame([
+            {"Tabela": nome, "Hits": c["chamadas"] - c["misses"], "Misses": c["misses"],
+             "Taxa de acerto": (c["chamadas"] - c["misses"]) / c["chamadas"] if c["chamadas"] else 0.0}
+            for nome, c in sorted(_contadores.items())
+        ])
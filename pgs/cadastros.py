@@ -6,6 +6,8 @@ from sqlalchemy.sql import select, update, delete
 from utils.hashes import make_hashes
 import pandas as pd
 from pgs.db import engine, get_db, tables
+from pgs.cache import referencia, invalidar
+from pgs.pontuacao import recalcular_resumo, periodo_da_data
 from sqlalchemy.exc import IntegrityError
 
 
@@ -35,6 +37,7 @@ def cadastro_reuniao():
                 stmt = insert(reunioes).values(nome=nome, data=data)
                 session.execute(stmt)
                 session.commit()
+            invalidar("reunioes")
 
             st.success("✅ Reunião cadastrada com sucesso!")
         except Exception as e:
@@ -62,9 +65,7 @@ def delete_reuniao():
 
     # Buscar reuniões existentes
     try:
-        with Session(engine) as session:
-            stmt = select(reunioes.c.id, reunioes.c.nome, reunioes.c.data)
-            result = session.execute(stmt).fetchall()
+        result = list(referencia("reunioes")[["id", "nome", "data"]].itertuples(index=False, name=None))
 
         if result:
             reuniao_selecionada = st.selectbox(
@@ -89,7 +90,12 @@ def delete_reuniao():
                             .values(nome=novo_nome, data=nova_data)
                         )
                         session.execute(stmt)
+
+                        # A data pode ter mudado de mês: refaz os totais dos dois meses
+                        recalcular_resumo(session, [periodo_da_data(reuniao_selecionada[2]),
+                                                    periodo_da_data(nova_data)])
                         session.commit()
+                    invalidar("reunioes")
 
                     st.success(f"✅ Reunião '{novo_nome}' atualizada com sucesso!")
                     st.rerun()
@@ -102,7 +108,9 @@ def delete_reuniao():
                     with Session(engine) as session:
                         stmt = delete(reunioes).where(reunioes.c.id == reuniao_selecionada[0])
                         session.execute(stmt)
+                        recalcular_resumo(session, [periodo_da_data(reuniao_selecionada[2])])
                         session.commit()
+                    invalidar("reunioes")
 
                     st.warning(f"⚠️ Reunião '{reuniao_selecionada[1]}' foi excluída!")
                     st.rerun()
@@ -141,6 +149,7 @@ def cadastro_unidade():
                 stmt = insert(unidades).values(nome=nome)
                 session.execute(stmt)
                 session.commit()
+            invalidar("unidades")
 
             st.success("✅ Unidade cadastrada com sucesso!")
             st.rerun()
@@ -168,10 +177,8 @@ def cadastro_membro():
     st.subheader("Cadastro de Membro")
 
     # Buscar unidades
-    with Session(engine) as session:
-        result = session.execute(select(unidades.c.id, unidades.c.nome)).fetchall()
-
-    unidade_opcoes = {row[1]: row[0] for row in result} if result else {}
+    unidades_df = referencia("unidades")
+    unidade_opcoes = {row.nome: int(row.id) for row in unidades_df.itertuples()}
 
     nome = st.text_input("Nome do Membro")
     unidade_nome = st.selectbox("Unidade", list(unidade_opcoes.keys()), key='unidade_nome')
@@ -190,6 +197,7 @@ def cadastro_membro():
                     )
                     session.execute(stmt)
                     session.commit()
+                invalidar("membros")
 
                 st.success(f"✅ Membro '{nome}' cadastrado com sucesso com código SGC {codigo_sgc}!")
                 st.rerun()  # Atualiza a tela para mostrar o novo membro
@@ -240,10 +248,8 @@ def delete_membro():
         novo_cargo = st.selectbox("Cargo", cargos_disponiveis,
                                   index=cargos_disponiveis.index(cargo_atual) if cargo_atual in cargos_disponiveis else 0)
 
-        with Session(engine) as session:
-            result = session.execute(select(unidades.c.id, unidades.c.nome)).fetchall()
-
-        unidade_opcoes = {row[1]: row[0] for row in result} if result else {}
+        unidades_df = referencia("unidades")
+        unidade_opcoes = {row.nome: int(row.id) for row in unidades_df.itertuples()}
 
         # Garante que a unidade do membro está na lista para evitar erro
         if membro_info["unidade"] in unidade_opcoes:
@@ -265,6 +271,7 @@ def delete_membro():
                 )
                 session.execute(stmt)
                 session.commit()
+            invalidar("membros")
 
             st.success(f"✅ Membro '{novo_nome}' atualizado com sucesso!")
             st.rerun()
@@ -275,6 +282,7 @@ def delete_membro():
                 stmt = delete(membros).where(membros.c.id == membro_id)
                 session.execute(stmt)
                 session.commit()
+            invalidar("membros")
 
             st.warning(f"⚠️ Membro '{membro_info['nome']}' foi excluído!")
             st.rerun()
@@ -298,14 +306,12 @@ def gerenciar_usuarios():
         return
 
     # Buscar membros disponíveis
-    with Session(engine) as session:
-        result = session.execute(select(membros.c.nome, membros.c.codigo_sgc)).fetchall()
+    df_membros = referencia("membros")[["nome", "codigo_sgc"]]
 
-    if not result:
+    if df_membros.empty:
         st.warning("⚠️ Nenhum membro encontrado. Cadastre um membro antes de criar um usuário.")
         return
 
-    df_membros = pd.DataFrame(result, columns=["nome", "codigo_sgc"])
     df_membros["Display"] = df_membros["codigo_sgc"] + " - " + df_membros["nome"]
 
     # Seleção do membro pelo código SGC
@@ -449,6 +455,7 @@ def cadastro_especialidade():
                         stmt = insert(especialidades).values(codigo=codigo_esp, nome=nome_esp)
                         session.execute(stmt)
                         session.commit()
+                        invalidar("especialidades")
                         st.success("✅ Especialidade cadastrada com sucesso!")
                         st.rerun()
             else:
@@ -466,9 +473,8 @@ def cadastro_especialidade():
 
             st.dataframe(df)  # Mostrar prévia do arquivo
 
-            with Session(engine) as session:
-                # Obter todos os códigos já cadastrados no banco
-                codigos_existentes = set(row[0] for row in session.execute(select(especialidades.c.codigo)).fetchall())
+            # Obter todos os códigos já cadastrados no banco
+            codigos_existentes = set(referencia("especialidades")["codigo"])
 
             # Separar os novos e os duplicados
             df_novos = df[~df['codigo'].isin(codigos_existentes)]
@@ -495,6 +501,7 @@ def cadastro_especialidade():
                             )
 
                     session.commit()
+                invalidar("especialidades")
 
                 st.success("✅ Especialidades cadastradas/atualizadas com sucesso!")
                 st.rerun()
@@ -525,6 +532,7 @@ def cadastro_classe():
                         stmt = insert(classe).values(codigo=codigo_cl, nome=nome_cl)
                         session.execute(stmt)
                         session.commit()
+                        invalidar("classe")
                         st.success("✅ Classe cadastrada com sucesso!")
                         st.rerun()
             else:
@@ -1,8 +1,38 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import select, insert, update
+from sqlalchemy.sql import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from pgs.db import engine, tables
+from pgs.cache import referencia
+from pgs.pontuacao import recalcular_resumo, periodo_da_data
+from pgs.paginacao import paginar, controles_paginacao, estimar_linhas
+
+
+def upsert_chamadas(session, chamadas, registros):
+    """
+    Grava as chamadas de uma vez: um único INSERT ... ON CONFLICT em lote,
+    apoiado na restrição única (reuniao_id, id_unidade, membro).
+    """
+    if not registros:
+        return
+
+    stmt = pg_insert(chamadas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[chamadas.c.reuniao_id, chamadas.c.id_unidade, chamadas.c.membro],
+        set_={
+            "presenca": stmt.excluded.presenca,
+            "pontualidade": stmt.excluded.pontualidade,
+            "uniforme": stmt.excluded.uniforme,
+            "modestia": stmt.excluded.modestia,
+        }
+    )
+
+    session.execute(stmt, [
+        {"reuniao_id": r[0], "id_unidade": r[1], "membro": r[2], "presenca": r[3],
+         "pontualidade": r[4], "uniforme": r[5], "modestia": r[6]}
+        for r in registros
+    ])
 
 
 def registrar_chamada():
@@ -20,23 +50,31 @@ def registrar_chamada():
         st.error("❌ Algumas tabelas não foram encontradas no banco de dados.")
         return
 
-    with Session(engine) as session:
-        reunioes_df = pd.DataFrame(session.execute(select(reunioes)).fetchall(), columns=reunioes.columns.keys())
-        unidades_df = pd.DataFrame(session.execute(select(unidades)).fetchall(), columns=unidades.columns.keys())
+    reunioes_df = referencia("reunioes")
+    unidades_df = referencia("unidades")
 
     reuniao = st.selectbox("Reunião", reunioes_df["nome"].tolist()[::-1] if not reunioes_df.empty else [])
     unidade_nome = st.selectbox("Unidade", unidades_df["nome"] if not unidades_df.empty else [])
 
     if reuniao and unidade_nome:
         reuniao_id = int(reunioes_df.loc[reunioes_df["nome"] == reuniao, "id"].values[0])
+        data_reuniao = reunioes_df.loc[reunioes_df["nome"] == reuniao, "data"].values[0]
         unidade_id = int(unidades_df.loc[unidades_df["nome"] == unidade_nome, "id"].values[0])
 
+        membros_df = referencia("membros")
+        membros_unidade = membros_df.loc[membros_df["id_unidade"] == unidade_id, ["nome", "cargo"]] \
+            .sort_values(["cargo", "nome"])
+
+        # Pontuações já registradas para a unidade nesta reunião, em uma única consulta
         with Session(engine) as session:
-            membros_unidade = pd.DataFrame(session.execute(
-                select(membros.c.nome, membros.c.cargo)
-                .where(membros.c.id_unidade == unidade_id)
-                .order_by(membros.c.cargo, membros.c.nome)
-            ).fetchall(), columns=["nome", "cargo"])
+            existentes = session.execute(
+                select(chamadas.c.membro, chamadas.c.presenca, chamadas.c.pontualidade,
+                       chamadas.c.uniforme, chamadas.c.modestia)
+                .where(chamadas.c.reuniao_id == reuniao_id)
+                .where(chamadas.c.id_unidade == unidade_id)
+            ).fetchall()
+
+        chamadas_existentes = {row.membro: tuple(row[1:]) for row in existentes}
 
         membros_por_cargo = {}
         for _, row in membros_unidade.iterrows():
@@ -51,15 +89,8 @@ def registrar_chamada():
             for nome in membros_lista:
                 st.subheader(nome)
 
-                with Session(engine) as session:
-                    chamada_existente = session.execute(
-                        select(chamadas.c.presenca, chamadas.c.pontualidade, chamadas.c.uniforme, chamadas.c.modestia)
-                        .where(chamadas.c.reuniao_id == reuniao_id)
-                        .where(chamadas.c.id_unidade == unidade_id)
-                        .where(chamadas.c.membro == nome)
-                    ).fetchone()
-
-                presenca_valor, pontualidade_valor, uniforme_valor, modestia_valor = chamada_existente or (0, 0, 0, 0)
+                presenca_valor, pontualidade_valor, uniforme_valor, modestia_valor = \
+                    chamadas_existentes.get(nome, (0, 0, 0, 0))
 
                 col1, col2, col3, col4, col5 = st.columns(5)
 
@@ -91,26 +122,8 @@ def registrar_chamada():
 
         if st.button("Salvar Chamada"):
             with Session(engine) as session:
-                for r in registros:
-                    chamada_existente = session.execute(
-                        select(chamadas.c.id)
-                        .where(chamadas.c.reuniao_id == r[0])
-                        .where(chamadas.c.id_unidade == r[1])
-                        .where(chamadas.c.membro == r[2])
-                    ).fetchone()
-
-                    if chamada_existente:
-                        stmt = update(chamadas).where(chamadas.c.id == chamada_existente[0]).values(
-                            presenca=r[3], pontualidade=r[4], uniforme=r[5], modestia=r[6]
-                        )
-                    else:
-                        stmt = insert(chamadas).values(
-                            reuniao_id=r[0], id_unidade=r[1], membro=r[2], presenca=r[3],
-                            pontualidade=r[4], uniforme=r[5], modestia=r[6]
-                        )
-
-                    session.execute(stmt)
-
+                upsert_chamadas(session, chamadas, registros)
+                recalcular_resumo(session, [periodo_da_data(data_reuniao)], unidades=[unidade_id])
                 session.commit()
                 st.success("✅ Chamada registrada/atualizada com sucesso!")
                 st.rerun()
@@ -130,32 +143,49 @@ def visualizar_chamada():
         st.error("❌ Algumas tabelas não foram encontradas no banco de dados.")
         return
 
+    st.subheader("📌 Chamadas Registradas")
+
+    # 🔹 Filtros aplicados no WHERE da consulta
+    reunioes_df = referencia("reunioes")
+    unidades_df = referencia("unidades")
+
+    col1, col2, col3, col4 = st.columns(4)
+    reuniao = col1.selectbox("Reunião", ["Todas"] + reunioes_df["nome"].tolist()[::-1], key="filtro_chamada_reuniao")
+    unidade = col2.selectbox("Unidade", ["Todas"] + unidades_df["nome"].tolist(), key="filtro_chamada_unidade")
+    membro = col3.text_input("Membro", key="filtro_chamada_membro")
+    periodo = col4.date_input("Período", value=(), key="filtro_chamada_periodo")
+
+    stmt = select(
+        chamadas.c.id,
+        chamadas.c.reuniao_id,
+        reunioes.c.nome.label("Reuniao_Nome"),
+        reunioes.c.data.label("Data"),
+        chamadas.c.membro,
+        chamadas.c.id_unidade,
+        unidades.c.nome.label("Unidade_Nome")
+    ).join(reunioes, chamadas.c.reuniao_id == reunioes.c.id) \
+     .join(unidades, chamadas.c.id_unidade == unidades.c.id)
+
+    if reuniao != "Todas":
+        stmt = stmt.where(chamadas.c.reuniao_id == int(reunioes_df.loc[reunioes_df["nome"] == reuniao, "id"].values[0]))
+    if unidade != "Todas":
+        stmt = stmt.where(chamadas.c.id_unidade == int(unidades_df.loc[unidades_df["nome"] == unidade, "id"].values[0]))
+    if membro.strip():
+        stmt = stmt.where(chamadas.c.membro.ilike(f"%{membro.strip()}%"))
+    if len(periodo) == 2:
+        stmt = stmt.where(reunioes.c.data.between(periodo[0], periodo[1]))
+
     with Session(engine) as session:
-        chamadas_query = session.execute(
-            select(
-                chamadas.c.id,
-                chamadas.c.reuniao_id,
-                reunioes.c.nome.label("Reuniao_Nome"),
-                chamadas.c.membro,
-                chamadas.c.id_unidade,
-                unidades.c.nome.label("Unidade_Nome")
-            ).join(reunioes, chamadas.c.reuniao_id == reunioes.c.id)
-             .join(unidades, chamadas.c.id_unidade == unidades.c.id)
-        ).fetchall()
-
-        chamadas_df = pd.DataFrame(chamadas_query, columns=["ID", "Reuniao_ID", "Reuniao_Nome", "Membro", "id_unidade", "Unidade_Nome"])
+        total_estimado = estimar_linhas(session, stmt)
+        linhas, proximo = paginar(session, stmt, [chamadas.c.id], "pagina_chamadas",
+                                  (reuniao, unidade, membro.strip(), tuple(periodo)))
 
-    st.subheader("📌 Chamadas Registradas")
+    chamadas_df = pd.DataFrame(linhas, columns=["ID", "Reuniao_ID", "Reuniao_Nome", "Data", "Membro",
+                                                "id_unidade", "Unidade_Nome"])
 
     if not chamadas_df.empty:
+        st.caption(f"≈ {total_estimado:,} chamadas encontradas".replace(",", "."))
         st.dataframe(chamadas_df)
+        controles_paginacao("pagina_chamadas", proximo)
     else:
         st.info("ℹ️ Nenhuma chamada registrada ainda.")
-
-
-
-
-
-
-
-
@@ -3,6 +3,7 @@ import pandas as pd
 from sqlalchemy.orm import Session
 from sqlalchemy import select, insert, delete
 from pgs.db import get_db, engine, tables
+from pgs.cache import referencia, invalidar
 
 
 def mostrar_classes_usuario(codigo_sgc):
@@ -58,10 +59,8 @@ def gerenciar_classes_usuario():
 
     st.subheader("📌 Gerenciar Classes do Usuário")
 
-    with Session(engine) as session:
-        # Buscar usuários disponíveis
-        usuarios_query = session.execute(select(membros.c.codigo_sgc, membros.c.nome)).fetchall()
-        usuarios = pd.DataFrame(usuarios_query, columns=["codigo_sgc", "nome"])
+    # Buscar usuários disponíveis
+    usuarios = referencia("membros")[["codigo_sgc", "nome"]]
 
     if usuarios.empty:
         st.warning("⚠️ Nenhum usuário encontrado.")
@@ -78,11 +77,10 @@ def gerenciar_classes_usuario():
     # Obter o código SGC real do usuário selecionado
     codigo_sgc = usuarios.loc[usuarios["codigo_sgc"] + " - " + usuarios["nome"] == usuario_selecionado, "codigo_sgc"].values[0]
 
-    with Session(engine) as session:
-        # Buscar todas as classes disponíveis
-        classes_query = session.execute(select(classe.c.codigo, classe.c.nome)).fetchall()
-        classes = pd.DataFrame(classes_query, columns=["codigo", "nome"])
+    # Buscar todas as classes disponíveis
+    classes = referencia("classe")[["codigo", "nome"]]
 
+    with Session(engine) as session:
         # Buscar classes que o usuário já possui
         classes_usuario_query = session.execute(
             select(user_classes.c.codigo_classe).where(user_classes.c.codigo_sgc == codigo_sgc)
@@ -136,5 +134,6 @@ def gerenciar_classes_usuario():
                     )
 
             session.commit()
+        invalidar("user_classes")
         st.success("✅ Classes atualizadas com sucesso!")
         st.rerun()
\ No newline at end of file
@@ -1,9 +1,14 @@
 import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, MetaData, Table
+from sqlalchemy import create_engine, MetaData, Table, text, func
 from sqlalchemy.orm import scoped_session, sessionmaker, Session
 from sqlalchemy.sql import select
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, NoSuchTableError
+from pgs.instrumentacao import ATIVO as INSTRUMENTACAO_ATIVA, instrumentar
 
 # **Carregar variáveis de ambiente**
 load_dotenv()
@@ -14,21 +19,148 @@ DB_NAME = os.getenv('DB_NAME')
 DB_HOST = os.getenv('DB_HOST')
 DB_PORT = os.getenv('DB_PORT')
 
+# **Diretório do cache local do esquema refletido**
+SCHEMA_CACHE_DIR = os.getenv('SCHEMA_CACHE_DIR', '.cache')
+
 # **Criar URL de conexão**
 DB_URL = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
 # **Criar engine global**
 engine = create_engine(DB_URL, pool_size=20, max_overflow=10)
 
+# **Instrumentação opcional das consultas (DB_INSTRUMENTACAO=1)**
+if INSTRUMENTACAO_ATIVA:
+    instrumentar(engine)
+
+# **Consultas independentes executadas em paralelo (threads do processo)**
+CONSULTAS_PARALELAS = int(os.getenv('DB_CONSULTAS_PARALELAS', '4'))
+_executor_consultas = ThreadPoolExecutor(max_workers=CONSULTAS_PARALELAS, thread_name_prefix="consultas")
+
 # **Criar sessão compartilhada**
 SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 
-# **Carregar metadados e tabelas**
-metadata = MetaData()
-metadata.reflect(bind=engine)
-tables = {table_name: Table(table_name, metadata, autoload_with=engine) for table_name in metadata.tables.keys()}
-
-print("✅ Conexão estabelecida! Tabelas carregadas:", ", ".join(tables.keys()))
+# **Impressão digital barata do esquema: uma única consulta ao catálogo**
+QUERY_FINGERPRINT = text("""
+    SELECT md5(coalesce(string_agg(item, '|' ORDER BY item), ''))
+    FROM (
+        SELECT table_name || '.' || column_name || ':' || data_type || ':' || is_nullable
+        FROM information_schema.columns
+        WHERE table_schema = current_schema()
+        UNION ALL
+        SELECT indexdef
+        FROM pg_indexes
+        WHERE schemaname = current_schema()
+        UNION ALL
+        SELECT conrelid::regclass::text || ':' || pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE connamespace = current_schema()::regnamespace
+    ) AS esquema(item)
+""")
+
+
+class TabelasLazy:
+    """
+    Dicionário de tabelas refletidas sob demanda.
+
+    Cada tabela só é refletida na primeira vez em que uma página a pede, e o
+    MetaData resultante é gravado em disco com a impressão digital do esquema
+    no nome do arquivo. Enquanto o esquema não mudar, reinícios do servidor
+    carregam as tabelas do arquivo sem consultar o catálogo do banco.
+    """
+
+    def __init__(self, bind, diretorio_cache):
+        self.bind = bind
+        self.diretorio_cache = diretorio_cache
+        self.metadata = MetaData()
+        self.fingerprint = None
+        self.tempo_inicializacao = None
+        self._lock = threading.RLock()
+
+    def _arquivo_cache(self):
+        return os.path.join(self.diretorio_cache, f"schema_{self.fingerprint}.pickle")
+
+    def _inicializar(self):
+        if self.fingerprint is not None:
+            return
+
+        inicio = time.perf_counter()
+        with self.bind.connect() as conn:
+            self.fingerprint = conn.execute(QUERY_FINGERPRINT).scalar()
+
+        origem = "banco"
+        arquivo = self._arquivo_cache()
+        if os.path.exists(arquivo):
+            try:
+                with open(arquivo, "rb") as f:
+                    self.metadata = pickle.load(f)
+                origem = "cache"
+            except Exception as e:
+                print(f"⚠️ Cache de esquema inválido ({e}), refletindo novamente.")
+                self.metadata = MetaData()
+
+        self.tempo_inicializacao = time.perf_counter() - inicio
+        print(f"✅ Conexão estabelecida! Esquema ({origem}) carregado em {self.tempo_inicializacao:.3f}s:",
+              ", ".join(self.metadata.tables.keys()) or "nenhuma tabela refletida ainda")
+
+    def _salvar_cache(self):
+        os.makedirs(self.diretorio_cache, exist_ok=True)
+
+        # Remove caches de esquemas antigos
+        for nome in os.listdir(self.diretorio_cache):
+            if nome.startswith("schema_") and nome != os.path.basename(self._arquivo_cache()):
+                os.remove(os.path.join(self.diretorio_cache, nome))
+
+        # Grava em arquivo temporário exclusivo do processo e troca de forma atômica
+        temporario = f"{self._arquivo_cache()}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            pickle.dump(self.metadata, f)
+        os.replace(temporario, self._arquivo_cache())
+
+    def get(self, nome, default=None):
+        with self._lock:
+            self._inicializar()
+
+            tabela = self.metadata.tables.get(nome)
+            if tabela is not None:
+                return tabela
+
+            inicio = time.perf_counter()
+            try:
+                tabela = Table(nome, self.metadata, autoload_with=self.bind)
+            except NoSuchTableError:
+                print(f"❌ Tabela '{nome}' não encontrada.")
+                return default
+
+            print(f"🔎 Tabela '{nome}' refletida em {time.perf_counter() - inicio:.3f}s")
+            self._salvar_cache()
+            return tabela
+
+    def __getitem__(self, nome):
+        tabela = self.get(nome)
+        if tabela is None:
+            raise KeyError(nome)
+        return tabela
+
+    def __contains__(self, nome):
+        return self.get(nome) is not None
+
+    def keys(self):
+        """Tabelas já refletidas (ou carregadas do cache) até agora."""
+        return self.metadata.tables.keys()
+
+    def limpar_cache(self):
+        """Descarta o esquema em memória e em disco; a próxima consulta reflete tudo de novo."""
+        with self._lock:
+            if os.path.isdir(self.diretorio_cache):
+                for nome in os.listdir(self.diretorio_cache):
+                    if nome.startswith("schema_"):
+                        os.remove(os.path.join(self.diretorio_cache, nome))
+            self.metadata = MetaData()
+            self.fingerprint = None
+
+
+# **Tabelas refletidas sob demanda**
+tables = TabelasLazy(engine, SCHEMA_CACHE_DIR)
 
 # **Função para obter uma sessão do banco**
 def get_db():
@@ -38,46 +170,55 @@ def get_db():
     finally:
         db.close()  # Garante que a conexão é fechada corretamente após o uso
 
-# **Função para obter dados de um usuário**
-def get_usuario(login, senha_hash):
-    """Obtém informações do usuário e seu membro associado."""
-    with Session(engine) as session:
-        usuarios_table = tables.get("usuarios")
-        membros_table = tables.get("membros")
-
-        if usuarios_table is None or membros_table is None:
-            print("❌ Tabelas 'usuarios' ou 'membros' não encontradas.")
-            return None
-
-        # **Buscar usuário**
-        query_usuarios = select(usuarios_table).where(
-            (usuarios_table.c.login == login) & (usuarios_table.c.senha == senha_hash)
+# **Função para executar consultas independentes em paralelo**
+def consultar_em_paralelo(consultas):
+    """
+    Executa as funções `funcao(session)` de `consultas` (nome -> função) ao
+    mesmo tempo, cada uma com sua própria sessão tirada do pool do engine.
+    Retorna um dicionário nome -> resultado; a primeira exceção é repassada.
+    """
+    def executar(funcao):
+        with Session(engine) as session:
+            return funcao(session)
+
+    futuros = {nome: _executor_consultas.submit(executar, funcao) for nome, funcao in consultas.items()}
+    return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+# **Função para obter o contexto completo do usuário no login**
+def get_contexto_usuario(login, senha_hash):
+    """Obtém usuário, membro associado e permissões em uma única consulta."""
+    usuarios_table = tables.get("usuarios")
+    membros_table = tables.get("membros")
+    permissao_table = tables.get("permissao")
+
+    if usuarios_table is None or membros_table is None or permissao_table is None:
+        print("❌ Tabelas 'usuarios', 'membros' ou 'permissao' não encontradas.")
+        return None
+
+    query = (
+        select(
+            usuarios_table.c.codigo_sgc,
+            membros_table.c.nome,
+            membros_table.c.cargo,
+            membros_table.c.id_unidade,
+            func.array_remove(func.array_agg(permissao_table.c.permissao.distinct()), None).label("permissoes"),
         )
-        usuario = session.execute(query_usuarios).fetchone()
-
-        if not usuario:
-            return None  # Usuário não encontrado
+        .join(membros_table, membros_table.c.codigo_sgc == usuarios_table.c.codigo_sgc)
+        .outerjoin(permissao_table, permissao_table.c.codigo_sgc == usuarios_table.c.codigo_sgc)
+        .where((usuarios_table.c.login == login) & (usuarios_table.c.senha == senha_hash))
+        .group_by(usuarios_table.c.codigo_sgc, membros_table.c.nome, membros_table.c.cargo,
+                  membros_table.c.id_unidade)
+    )
 
-        # **Buscar o membro associado**
-        query_membros = select(membros_table).where(membros_table.c.codigo_sgc == usuario.codigo_sgc)
-        membro = session.execute(query_membros).fetchone()
+    with Session(engine) as session:
+        usuario = session.execute(query).mappings().first()
 
-        if not membro:
-            return None  # Não há correspondência na tabela membros
+    if not usuario:
+        return None  # Usuário não encontrado ou sem membro associado
 
-        # **Retornar os dados do usuário e membro**
-        return {
-            "id": usuario.id,
-            "login": usuario.login,
-            "permissao": usuario.permissao,
-            "codigo_sgc": usuario.codigo_sgc,
-            "nome": membro.nome,
-            "id_unidade": membro.id_unidade,
-            "cargo": membro.cargo,
-        }
+    return dict(usuario, permissoes=list(usuario["permissoes"] or []))
 
 # **Função para encerrar a conexão ao finalizar o servidor**
 def close_db():
     engine.dispose()
     print("🔌 Conexão com o banco de dados foi fechada.")
-
@@ -3,6 +3,7 @@ import streamlit as st
 from sqlalchemy import create_engine, MetaData, select, insert, delete
 from sqlalchemy.orm import Session
 from pgs.db import get_db, engine, tables
+from pgs.cache import referencia
 
 
 def listar_eventos():
@@ -15,10 +16,7 @@ def listar_eventos():
         st.error("❌ A tabela 'evento' não foi encontrada no banco de dados.")
         return pd.DataFrame()
 
-    with Session(engine) as session:
-        eventos_query = session.execute(select(eventos.c.id, eventos.c.nome)).fetchall()
-
-    return pd.DataFrame(eventos_query, columns=["id", "nome"])
+    return referencia("evento")[["id", "nome"]]
 
 
 
@@ -120,14 +118,13 @@ def cadastrar_documento_evento():
 
     st.subheader("📜 Cadastrar Documentos Necessários para Eventos")
 
-    with Session(engine) as session:
-        eventos_query = session.execute(select(eventos.c.id, eventos.c.nome)).fetchall()
+    eventos_df = listar_eventos()
 
-    if not eventos_query:
+    if eventos_df.empty:
         st.warning("Nenhum evento encontrado. Cadastre um evento antes de adicionar documentos.")
         return
 
-    eventos_opcoes = {str(e.id): e.nome for e in eventos_query}
+    eventos_opcoes = {str(e.id): e.nome for e in eventos_df.itertuples()}
     evento_selecionado = st.selectbox("Selecione o evento", list(eventos_opcoes.values()))
     evento_id = next(e for e in eventos_opcoes if eventos_opcoes[e] == evento_selecionado)
 
@@ -177,17 +174,16 @@ def docs():
         st.table(documentos)
 
     st.subheader("📤 Registrar Entrega de Documento")
-    with Session(engine) as session:
-        membros_query = session.execute(
-            select(membros.c.nome, membros.c.codigo_sgc, unidades.c.nome)
-            .join(unidades, membros.c.id_unidade == unidades.c.id)
-        ).fetchall()
+    membros_df = referencia("membros").merge(
+        referencia("unidades")[["id", "nome"]].rename(columns={"id": "id_unidade", "nome": "unidade"}),
+        on="id_unidade"
+    )
 
-    if not membros_query:
+    if membros_df.empty:
         st.warning("Nenhum membro encontrado.")
         return
 
-    membro_dict = {f"{row.nome} ({row[2]})": row.codigo_sgc for row in membros_query}
+    membro_dict = {f"{row.nome} ({row.unidade})": row.codigo_sgc for row in membros_df.itertuples()}
     membro_selecionado = st.selectbox("Selecione o membro:", list(membro_dict.keys()), key='membro')
     membro_id = membro_dict[membro_selecionado]
 
@@ -3,6 +3,7 @@ import streamlit as st
 from sqlalchemy.orm import Session
 from sqlalchemy import select, delete, insert
 from pgs.db import get_db, engine, tables
+from pgs.cache import referencia, invalidar
 
 
 def mostrar_especialidades_usuario(codigo_sgc):
@@ -54,8 +55,7 @@ def gerenciar_especialidades_usuario():
 
     with Session(engine) as session:
         # Buscar usuários disponíveis
-        usuarios_query = session.execute(select(membros.c.codigo_sgc, membros.c.nome)).fetchall()
-        usuarios_df = pd.DataFrame(usuarios_query, columns=["codigo_sgc", "nome"])
+        usuarios_df = referencia("membros")[["codigo_sgc", "nome"]]
 
         if usuarios_df.empty:
             st.warning("⚠️ Nenhum usuário encontrado.")
@@ -74,8 +74,7 @@ def gerenciar_especialidades_usuario():
         ].values[0]
 
         # Buscar todas as especialidades disponíveis
-        especialidades_query = session.execute(select(especialidades.c.codigo, especialidades.c.nome)).fetchall()
-        especialidades_df = pd.DataFrame(especialidades_query, columns=["codigo", "nome"])
+        especialidades_df = referencia("especialidades")[["codigo", "nome"]]
 
         if especialidades_df.empty:
             st.warning("⚠️ Nenhuma especialidade encontrada.")
@@ -136,6 +135,7 @@ def gerenciar_especialidades_usuario():
                         ))
 
                 session.commit()  # ✅ Confirma todas as alterações no banco
+                invalidar("user_especialidades")
                 st.success("✅ Especialidades atualizadas com sucesso!")
                 st.rerun()
 
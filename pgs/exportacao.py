@@ -0,0 +1,303 @@
+import os
+import csv
+import gzip
+import time
+import queue
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import xlsxwriter
+import streamlit as st
+from sqlalchemy import types
+from pgs.db import engine, CONSULTAS_PARALELAS
+from pgs.tarefas import TTL_ARTEFATOS
+
+# **Linhas buscadas por vez do cursor no servidor**
+TAMANHO_LOTE = 1000
+
+# **CSVs de download_csv ainda em disco: caminho -> momento em que foram gerados**
+_arquivos_csv = {}
+_lock_arquivos = threading.Lock()
+
+# **Consultas lidas ao mesmo tempo ao montar uma planilha com várias abas**
+_executor_abas = ThreadPoolExecutor(max_workers=CONSULTAS_PARALELAS, thread_name_prefix="exportacao")
+
+
+def linhas_em_lotes(stmt, tamanho_lote=TAMANHO_LOTE, parametros=None, snapshot=None):
+    """
+    Lotes de linhas de `stmt` (com os valores de `parametros`) lidos de um
+    cursor no servidor: nem o banco nem o Python montam o resultado inteiro
+    em memória.
+
+    Com `snapshot` (um identificador de pg_export_snapshot()), a leitura vê
+    exatamente os dados daquele snapshot, como a transação que o exportou.
+    """
+    with engine.connect() as conn:
+        if snapshot is not None:
+            conn.execution_options(isolation_level="REPEATABLE READ")
+            conn.exec_driver_sql("SET TRANSACTION SNAPSHOT %s", (snapshot,))  # Primeira instrução da transação
+        result = conn.execution_options(stream_results=True, yield_per=tamanho_lote).execute(stmt, parametros)
+        yield from result.partitions()
+
+
+def _arquivo_temporario(sufixo):
+    fd, caminho = tempfile.mkstemp(prefix="exportacao_", suffix=sufixo)
+    os.close(fd)
+    return caminho
+
+
+def exportar_csv(stmt, colunas, tamanho_lote=TAMANHO_LOTE, progresso=None, parametros=None, compactar=False):
+    """
+    Grava o resultado de `stmt` em um CSV temporário (compactado com gzip se
+    `compactar`), lote a lote. Retorna (caminho, número de linhas).
+    `progresso(linhas)` é chamada a cada lote.
+    """
+    caminho = _arquivo_temporario(".csv.gz" if compactar else ".csv")
+    abrir = gzip.open if compactar else open
+    linhas = 0
+
+    with abrir(caminho, "wt", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(colunas)
+
+        for lote in linhas_em_lotes(stmt, tamanho_lote, parametros):
+            writer.writerows(lote)
+            linhas += len(lote)
+            if progresso:
+                progresso(linhas)
+
+    return caminho, linhas
+
+
+def exportar_xlsx(stmt, colunas, nome_aba="Relatório", tamanho_lote=TAMANHO_LOTE, progresso=None, parametros=None):
+    """
+    Grava o resultado de `stmt` em uma planilha Excel temporária, lote a lote.
+
+    O xlsxwriter em modo `constant_memory` descarrega cada linha no disco assim
+    que a próxima começa, então a memória não cresce com o tamanho do relatório.
+    Retorna (caminho, número de linhas). `progresso(linhas)` é chamada a cada lote.
+    """
+    caminho = _arquivo_temporario(".xlsx")
+    workbook = xlsxwriter.Workbook(caminho, {"constant_memory": True, "default_date_format": "dd/mm/yyyy",
+                                             "remove_timezone": True})
+    aba = workbook.add_worksheet(nome_aba[:31])
+    aba.write_row(0, 0, colunas)
+
+    linhas = 0
+    try:
+        for lote in linhas_em_lotes(stmt, tamanho_lote, parametros):
+            for linha in lote:
+                linhas += 1
+                aba.write_row(linhas, 0, linha)
+            if progresso:
+                progresso(linhas)
+    finally:
+        workbook.close()
+
+    return caminho, linhas
+
+
+def _colocar(fila, item, parar):
+    """Coloca `item` na fila, desistindo se quem consome já parou."""
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _ler_aba(nome, stmt, fila, parar, tamanho_lote, parametros, snapshot):
+    """Lê `stmt` em lotes na sua própria conexão e os entrega na fila como (aba, lote); None marca o fim."""
+    try:
+        for lote in linhas_em_lotes(stmt, tamanho_lote, parametros, snapshot):
+            if not _colocar(fila, (nome, lote), parar):
+                return
+    except Exception as e:
+        _colocar(fila, (nome, e), parar)
+        return
+    _colocar(fila, (nome, None), parar)
+
+
+def exportar_pasta_de_trabalho(consultas, tamanho_lote=TAMANHO_LOTE, progresso=None, parametros=None):
+    """
+    Grava várias consultas em uma única planilha Excel temporária, uma aba por
+    consulta. `consultas` é um dicionário nome da aba -> (stmt, colunas).
+
+    As consultas rodam ao mesmo tempo, cada uma em uma conexão do pool, e os
+    lotes são escritos na aba correspondente à medida que chegam (o xlsxwriter
+    não é thread-safe, então só esta função escreve). A fila é limitada, então
+    a memória continua sem crescer com o tamanho dos relatórios.
+
+    Todas as abas leem o mesmo momento dos dados: uma transação REPEATABLE
+    READ exporta seu snapshot (pg_export_snapshot) e fica aberta até o fim,
+    e cada conexão de leitura o importa com SET TRANSACTION SNAPSHOT.
+    Retorna (caminho, {aba: número de linhas}). `progresso(linhas)` recebe esse
+    mesmo dicionário a cada lote.
+    """
+    conn_snapshot = engine.connect().execution_options(isolation_level="REPEATABLE READ")
+
+    caminho = _arquivo_temporario(".xlsx")
+    workbook = xlsxwriter.Workbook(caminho, {"constant_memory": True, "default_date_format": "dd/mm/yyyy",
+                                             "remove_timezone": True})
+    abas = {}
+    linhas = {}
+    for nome, (_, colunas) in consultas.items():
+        abas[nome] = workbook.add_worksheet(nome[:31])
+        abas[nome].write_row(0, 0, colunas)
+        linhas[nome] = 0
+
+    fila = queue.Queue(maxsize=2 * len(consultas))
+    parar = threading.Event()
+    pendentes = len(consultas)
+
+    try:
+        snapshot = conn_snapshot.exec_driver_sql("SELECT pg_export_snapshot()").scalar()
+        for nome, (stmt, _) in consultas.items():
+            _executor_abas.submit(_ler_aba, nome, stmt, fila, parar, tamanho_lote, parametros, snapshot)
+
+        while pendentes:
+            nome, lote = fila.get()
+            if lote is None:
+                pendentes -= 1
+                continue
+            if isinstance(lote, Exception):
+                raise lote
+
+            aba = abas[nome]
+            for linha in lote:
+                linhas[nome] += 1
+                aba.write_row(linhas[nome], 0, linha)
+            if progresso:
+                progresso(linhas)
+    finally:
+        parar.set()  # Em caso de erro, libera as leituras que ainda estão esperando espaço na fila
+        conn_snapshot.close()  # Encerra a transação que mantinha o snapshot
+        workbook.close()
+
+    return caminho, linhas
+
+
+def exportar_csv_gz(stmt, colunas, tamanho_lote=TAMANHO_LOTE, progresso=None, parametros=None):
+    """CSV compactado com gzip; ver `exportar_csv`."""
+    return exportar_csv(stmt, colunas, tamanho_lote, progresso, parametros, compactar=True)
+
+
+def _tipo_arrow(tipo):
+    """Tipo Arrow equivalente ao tipo SQLAlchemy da coluna, e a conversão dos valores."""
+    import pyarrow as pa
+
+    if isinstance(tipo, types.Boolean):
+        return pa.bool_(), None
+    if isinstance(tipo, types.Integer):
+        return pa.int64(), None
+    if isinstance(tipo, types.Float):
+        return pa.float64(), None
+    if isinstance(tipo, types.Numeric):
+        if tipo.precision is not None and tipo.precision <= 38:
+            return pa.decimal128(tipo.precision, tipo.scale or 0), None
+        return pa.float64(), float  # NUMERIC sem precisão: vira número de ponto flutuante
+    if isinstance(tipo, types.DateTime):
+        return pa.timestamp("us", tz="UTC" if tipo.timezone else None), None
+    if isinstance(tipo, types.Date):
+        return pa.date32(), None
+    if isinstance(tipo, types.Time):
+        return pa.time64("us"), None
+    if isinstance(tipo, types.String):
+        return pa.string(), None
+    return pa.string(), str
+
+
+def exportar_parquet(stmt, colunas, tamanho_lote=TAMANHO_LOTE, progresso=None, parametros=None):
+    """
+    Grava o resultado de `stmt` em um Parquet temporário, um row group por
+    lote, com os tipos das colunas da consulta (datas, inteiros, decimais).
+    Retorna (caminho, número de linhas). Requer o pacote pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos = [_tipo_arrow(coluna.type) for coluna in stmt.selected_columns]
+    schema = pa.schema([(nome, tipo) for nome, (tipo, _) in zip(colunas, tipos)])
+
+    caminho = _arquivo_temporario(".parquet")
+    linhas = 0
+
+    with pq.ParquetWriter(caminho, schema, compression="zstd") as writer:
+        for lote in linhas_em_lotes(stmt, tamanho_lote, parametros):
+            arrays = []
+            for valores, (tipo, converter) in zip(zip(*lote), tipos):
+                if converter:
+                    valores = [None if v is None else converter(v) for v in valores]
+                arrays.append(pa.array(valores, type=tipo))
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+            linhas += len(lote)
+            if progresso:
+                progresso(linhas)
+
+    return caminho, linhas
+
+
+# **Formatos de exportação: nome -> (função, extensão, tipo MIME)**
+FORMATOS = {
+    "Excel (.xlsx)": (exportar_xlsx, ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV compactado (.csv.gz)": (exportar_csv_gz, ".csv.gz", "application/gzip"),
+    "Parquet (.parquet)": (exportar_parquet, ".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def _limpar_arquivos_csv():
+    """Apaga os CSVs gerados há mais de TTL_ARTEFATOS, inclusive os de sessões que já acabaram."""
+    agora = time.time()
+    with _lock_arquivos:
+        vencidos = [caminho for caminho, gerado_em in _arquivos_csv.items() if agora - gerado_em > TTL_ARTEFATOS]
+        for caminho in vencidos:
+            del _arquivos_csv[caminho]
+    for caminho in vencidos:
+        remover_arquivo(caminho)
+
+
+def download_csv(stmt, colunas, chave_estado, filtros, nome_arquivo):
+    """
+    Botão "preparar" + botão de download para todas as linhas de `stmt`.
+
+    O arquivo só é gerado quando pedido e fica em st.session_state[chave_estado]
+    enquanto `filtros` não mudar. É apagado quando os filtros mudam, quando
+    outro é gerado ou, no máximo, TTL_ARTEFATOS segundos depois de criado.
+    """
+    _limpar_arquivos_csv()
+    estado = st.session_state.get(chave_estado)
+
+    if estado and (estado["filtros"] != filtros or not os.path.exists(estado["arquivo"])):
+        remover_arquivo(estado["arquivo"])
+        estado = None
+        del st.session_state[chave_estado]
+
+    if st.button("📥 Preparar CSV", key=f"{chave_estado}_preparar"):
+        if estado:
+            remover_arquivo(estado["arquivo"])
+        with st.spinner("Gerando arquivo..."):
+            arquivo, linhas = exportar_csv(stmt, colunas)
+        with _lock_arquivos:
+            _arquivos_csv[arquivo] = time.time()
+        estado = {"arquivo": arquivo, "linhas": linhas, "filtros": filtros}
+        st.session_state[chave_estado] = estado
+
+    if estado:
+        try:
+            f = open(estado["arquivo"], "rb")
+        except FileNotFoundError:  # Expirou e foi apagado pela limpeza de outra sessão
+            del st.session_state[chave_estado]
+            return
+        with f:
+            st.download_button(f"⬇️ Baixar CSV ({estado['linhas']} linhas)", f, file_name=nome_arquivo,
+                               mime="text/csv", key=f"{chave_estado}_baixar")
+
+
+def remover_arquivo(arquivo):
+    try:
+        os.remove(arquivo)
+    except OSError:
+        pass
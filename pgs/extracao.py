@@ -1,161 +1,410 @@
+import os
+import time
+import threading
 import pandas as pd
 import streamlit as st
-import io
-from sqlalchemy import create_engine, MetaData, select, func, desc
+from sqlalchemy import select, func, case, and_, or_, bindparam, Date, Integer
 from sqlalchemy.orm import Session
 from pgs.db import engine, tables
+from pgs.exportacao import FORMATOS, exportar_pasta_de_trabalho, remover_arquivo
+from pgs.paginacao import estimar_linhas
+from pgs.cache import versao_dados, referencia
+from pgs.tarefas import submeter, obter, descartar
 
+# **Linhas exibidas na prévia; o arquivo sempre traz o relatório completo**
+LINHAS_PREVIA = 200
 
-def exportar_para_excel(df):
-    """Gera um arquivo Excel em memória"""
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Relatório")
-    return output.getvalue()
+# **Parâmetros dos filtros: None desliga o filtro correspondente**
+INICIO = bindparam("inicio", type_=Date)
+FIM = bindparam("fim", type_=Date)
+ID_UNIDADE = bindparam("id_unidade", type_=Integer)
+ID_EVENTO = bindparam("id_evento", type_=Integer)
 
+PARAMETROS_PADRAO = {"inicio": None, "fim": None, "id_unidade": None, "id_evento": None}
 
-def gerar_relatorio(tipo_relatorio):
 
-    if not engine:
-        st.error("❌ Erro ao conectar ao banco de dados.")
-        return None
+def _no_periodo(coluna):
+    return and_(or_(INICIO.is_(None), coluna >= INICIO), or_(FIM.is_(None), coluna <= FIM))
 
-    with Session(engine) as session:
-        if tipo_relatorio == "Fluxo de Caixa":
-            caixa = tables.get("caixa")
-            if not caixa:
-                st.error("❌ Tabela 'caixa' não encontrada.")
-                return None
 
-            query = select(caixa.c.data, caixa.c.tipo, caixa.c.descricao, caixa.c.valor, caixa.c.id_evento).order_by(
-                caixa.c.data.desc()
-            )
+def _igual_a(coluna, parametro):
+    return or_(parametro.is_(None), coluna == parametro)
 
-        elif tipo_relatorio == "Patrimônio":
-            patrimonio = tables.get("patrimonio")
-            if not patrimonio:
-                st.error("❌ Tabela 'patrimonio' não encontrada.")
-                return None
 
-            query = select(patrimonio.c.item_nome, patrimonio.c.quantidade, patrimonio.c.categoria)
+def _fluxo_de_caixa():
+    caixa, evento = tables["caixa"], tables["evento"]
 
-        elif tipo_relatorio == "Livro Ata e Atos":
-            ata = tables.get("ata")
-            reunioes = tables.get("reunioes")
-            atos = tables.get("ato")
-            unidades = tables.get("unidades")
+    return (
+        select(caixa.c.data, caixa.c.tipo, caixa.c.descricao, caixa.c.valor, evento.c.nome.label("evento"))
+        .outerjoin(evento, caixa.c.id_evento == evento.c.id)
+        .where(_no_periodo(caixa.c.data), _igual_a(caixa.c.id_evento, ID_EVENTO))
+        .order_by(caixa.c.data.desc(), caixa.c.id.desc())
+    )
 
-            if not ata or not reunioes or not atos or not unidades:
-                st.error("❌ Algumas tabelas necessárias não foram encontradas.")
-                return None
 
-            query = select(
-                reunioes.c.Nome.label("reuniao"),
-                ata.c.titulo.label("ata_titulo"),
-                ata.c.descricao.label("ata_descricao"),
-                unidades.c.Nome.label("unidade"),
-                atos.c.titulo.label("ato_titulo"),
-                atos.c.descricao.label("ato_descricao")
-            ).join(reunioes, ata.c.reuniao_id == reunioes.c.ID) \
-                .outerjoin(atos, ata.c.id == atos.c.ata_id) \
-                .outerjoin(unidades, atos.c.unidade_id == unidades.c.ID) \
-                .order_by(reunioes.c.Nome, unidades.c.Nome)
-
-        elif tipo_relatorio == "Mensalidade":
-            user_mensalidades = tables.get("user_mensalidades")
-            membros = tables.get("membros")
-            mensalidades = tables.get("mensalidades")
-
-            if not user_mensalidades or not membros or not mensalidades:
-                st.error("❌ Algumas tabelas necessárias não foram encontradas.")
-                return None
+def _patrimonio():
+    patrimonio = tables["patrimonio"]
+
+    return (
+        select(patrimonio.c.nome, patrimonio.c.quantidade, patrimonio.c.descricao, patrimonio.c.data_aquisicao)
+        .where(_no_periodo(patrimonio.c.data_aquisicao))
+        .order_by(patrimonio.c.nome)
+    )
+
+
+def _livro_ata_e_atos():
+    ata, reunioes, atos, unidades = tables["ata"], tables["reunioes"], tables["ato"], tables["unidades"]
+
+    return (
+        select(
+            reunioes.c.nome.label("reuniao"),
+            reunioes.c.data,
+            ata.c.titulo.label("ata_titulo"),
+            ata.c.descricao.label("ata_descricao"),
+            unidades.c.nome.label("unidade"),
+            atos.c.titulo.label("ato_titulo"),
+            atos.c.descricao.label("ato_descricao"),
+        )
+        .join(reunioes, ata.c.reuniao_id == reunioes.c.id)
+        .outerjoin(atos, ata.c.id == atos.c.ata_id)
+        .outerjoin(unidades, atos.c.unidade_id == unidades.c.id)
+        .where(_no_periodo(reunioes.c.data), _igual_a(atos.c.unidade_id, ID_UNIDADE))
+        .order_by(reunioes.c.data, reunioes.c.nome, unidades.c.nome)
+    )
+
+
+def _mensalidade():
+    user_mensalidades, membros, mensalidades = tables["user_mensalidades"], tables["membros"], tables["mensalidades"]
+
+    def total(status):
+        return func.sum(case((user_mensalidades.c.status == status, mensalidades.c.valor), else_=0))
+
+    total_pendente = total("Pendente").label("total_pendente")
+    return (
+        select(
+            membros.c.nome.label("membro"),
+            func.count().label("total_mensalidades"),
+            total("Pago").label("total_pago"),
+            total_pendente,
+            total("Isento").label("total_isento"),
+        )
+        .join(membros, user_mensalidades.c.codigo_sgc == membros.c.codigo_sgc)
+        .join(mensalidades, user_mensalidades.c.id_mensalidade == mensalidades.c.id)
+        .where(_no_periodo(func.make_date(mensalidades.c.ano, mensalidades.c.mes, 1)),
+               _igual_a(membros.c.id_unidade, ID_UNIDADE))
+        .group_by(membros.c.codigo_sgc, membros.c.nome)
+        .order_by(total_pendente.desc(), membros.c.nome)
+    )
+
+
+def _unidades_e_classes():
+    membros, unidades = tables["membros"], tables["unidades"]
+    user_classes, classes = tables["user_classes"], tables["classe"]
+
+    return (
+        select(membros.c.nome.label("membro"), unidades.c.nome.label("unidade"), classes.c.nome.label("classe"))
+        .join(unidades, membros.c.id_unidade == unidades.c.id)
+        .outerjoin(user_classes, membros.c.codigo_sgc == user_classes.c.codigo_sgc)
+        .outerjoin(classes, user_classes.c.codigo_classe == classes.c.codigo)
+        .where(_igual_a(membros.c.id_unidade, ID_UNIDADE))
+        .order_by(unidades.c.nome, classes.c.nome, membros.c.nome)
+    )
+
+
+def _especialidades():
+    membros, unidades = tables["membros"], tables["unidades"]
+    user_especialidades, especialidades = tables["user_especialidades"], tables["especialidades"]
+
+    return (
+        select(membros.c.nome.label("membro"), unidades.c.nome.label("unidade"),
+               especialidades.c.nome.label("especialidade"))
+        .join(unidades, membros.c.id_unidade == unidades.c.id)
+        .outerjoin(user_especialidades, membros.c.codigo_sgc == user_especialidades.c.codigo_sgc)
+        .outerjoin(especialidades, user_especialidades.c.codigo_especialidade == especialidades.c.codigo)
+        .where(_igual_a(membros.c.id_unidade, ID_UNIDADE))
+        .order_by(unidades.c.nome, especialidades.c.nome, membros.c.nome)
+    )
+
+
+# **Relatórios disponíveis: consulta, tabelas lidas (a versão delas faz parte da chave do artefato) e filtros**
+# Toda tabela listada precisa de invalidar(...) logo após cada commit que a grava (insert, pg_insert, update, delete)
+RELATORIOS = {
+    "Fluxo de Caixa": {"consulta": _fluxo_de_caixa, "tabelas": ("caixa", "evento"),
+                       "filtros": ("periodo", "evento")},
+    "Patrimônio": {"consulta": _patrimonio, "tabelas": ("patrimonio",), "filtros": ("periodo",)},
+    "Livro Ata e Atos": {"consulta": _livro_ata_e_atos, "tabelas": ("ata", "reunioes", "ato", "unidades"),
+                         "filtros": ("periodo", "unidade")},
+    "Mensalidade": {"consulta": _mensalidade, "tabelas": ("user_mensalidades", "membros", "mensalidades"),
+                    "filtros": ("periodo", "unidade")},
+    "Unidades e Classes": {"consulta": _unidades_e_classes,
+                           "tabelas": ("membros", "unidades", "user_classes", "classe"), "filtros": ("unidade",)},
+    "Especialidades": {"consulta": _especialidades,
+                       "tabelas": ("membros", "unidades", "user_especialidades", "especialidades"),
+                       "filtros": ("unidade",)},
+}
 
-            query = select(
-                membros.c.Nome.label("membro"),
-                func.count().label("total_mensalidades"),
-                func.sum(func.case([(user_mensalidades.c.status == 'Pago', mensalidades.c.valor)], else_=0)).label("total_pago"),
-                func.sum(func.case([(user_mensalidades.c.status == 'Pendente', mensalidades.c.valor)], else_=0)).label("total_pendente"),
-                func.sum(func.case([(user_mensalidades.c.status == 'Isento', mensalidades.c.valor)], else_=0)).label("total_isento"),
-            ).join(membros, user_mensalidades.c.codigo_sgc == membros.c.codigo_sgc) \
-                .join(mensalidades, user_mensalidades.c.id_mensalidade == mensalidades.c.id) \
-                .group_by(membros.c.Nome) \
-                .order_by(desc("total_pendente"))
-
-        elif tipo_relatorio == "Unidades, Classes, Especialidades e Desbravadores":
-            user_classes = tables.get("user_classes")
-            classes = tables.get("classe")
-            user_especialidades = tables.get("user_especialidades")
-            especialidades = tables.get("especialidades")
-            membros = tables.get("membros")
-            unidades = tables.get("unidades")
-
-            if not user_classes or not classes or not user_especialidades or not especialidades or not membros or not unidades:
-                st.error("❌ Algumas tabelas necessárias não foram encontradas.")
+_consultas = {}  # relatório -> consulta já montada; os filtros entram como parâmetros na execução
+_lock = threading.Lock()
+
+
+def colunas_da_consulta(query):
+    return [col.name for col in query.selected_columns]
+
+
+def consulta_relatorio(nome):
+    """
+    Consulta do relatório, montada uma única vez e reaproveitada por todas as
+    sessões (o cache de compilação do SQLAlchemy também a reconhece). Retorna
+    None se alguma tabela não existe.
+    """
+    with _lock:
+        if nome not in _consultas:
+            try:
+                _consultas[nome] = RELATORIOS[nome]["consulta"]()
+            except KeyError as e:
+                st.error(f"❌ Tabela {e} não encontrada.")
                 return None
+        return _consultas[nome]
+
+
+def ler_consulta(query, parametros=None):
+    """Executa a consulta (com os valores de `parametros`) e devolve um DataFrame."""
+    with Session(engine) as session:
+        result = session.execute(query, parametros).fetchall()
+
+    return pd.DataFrame(result, columns=colunas_da_consulta(query))
+
+
+def gerar_relatorio(nome, parametros=None):
+    query = consulta_relatorio(nome)
+    return ler_consulta(query, {**PARAMETROS_PADRAO, **(parametros or {})}) if query is not None else None
+
+
+def _gerar_artefato(query, parametros, formato):
+    """Função da tarefa de segundo plano: prévia, estimativa de linhas e arquivo completo no formato escolhido."""
+    colunas = colunas_da_consulta(query)
+    exportar = FORMATOS[formato][0]
+
+    def executar(tarefa):
+        tarefa.mensagem = "Consultando..."
+        with Session(engine) as session:
+            total_estimado = max(estimar_linhas(session, query, parametros), 1)
+        previa = ler_consulta(query.limit(LINHAS_PREVIA), parametros)
+
+        def progresso(linhas):
+            tarefa.progresso = min(linhas / total_estimado, 0.99)
+            tarefa.mensagem = f"{linhas} linhas escritas"
+
+        arquivo, linhas = exportar(query, colunas, progresso=progresso, parametros=parametros)
+        return {"previa": previa, "arquivo": arquivo, "linhas": linhas}
+
+    return executar
+
+
+def _gerar_pasta_completa(consultas, parametros):
+    """Função da tarefa de segundo plano: todos os relatórios em uma planilha, uma aba por relatório."""
+
+    def executar(tarefa):
+        tarefa.mensagem = "Consultando..."
+        with Session(engine) as session:
+            total_estimado = max(sum(estimar_linhas(session, query, parametros) for query in consultas.values()), 1)
+
+        def progresso(linhas):
+            escritas = sum(linhas.values())
+            tarefa.progresso = min(escritas / total_estimado, 0.99)
+            tarefa.mensagem = f"{escritas} linhas escritas"
 
-            aba_selecionada = st.radio(
-                "Selecione o tipo de relatório", ["Unidades e Classes", "Especialidades"], key="relatorio_tipo_uc"
-            )
-
-            if aba_selecionada == "Unidades e Classes":
-                query = select(
-                    membros.c.Nome.label("membro"),
-                    unidades.c.Nome.label("unidade"),
-                    classes.c.nome.label("classe")
-                ).join(unidades, membros.c.id_unidade == unidades.c.ID) \
-                    .outerjoin(user_classes, membros.c.codigo_sgc == user_classes.c.codigo_sgc) \
-                    .outerjoin(classes, user_classes.c.codigo_classe == classes.c.codigo) \
-                    .order_by(unidades.c.Nome, classes.c.nome)
-            else:
-                query = select(
-                    membros.c.Nome.label("membro"),
-                    unidades.c.Nome.label("unidade"),
-                    especialidades.c.nome.label("especialidade")
-                ).join(unidades, membros.c.id_unidade == unidades.c.ID) \
-                    .outerjoin(user_especialidades, membros.c.codigo_sgc == user_especialidades.c.codigo_sgc) \
-                    .outerjoin(especialidades, user_especialidades.c.codigo_especialidade == especialidades.c.codigo) \
-                    .order_by(unidades.c.Nome, especialidades.c.nome)
-
-        else:
-            st.error("⚠️ Relatório não encontrado.")
-            return None
-
-        result = session.execute(query).fetchall()
-        df = pd.DataFrame(result, columns=[col.name for col in query.selected_columns])
-
-    return df
+        arquivo, linhas = exportar_pasta_de_trabalho(
+            {nome: (query, colunas_da_consulta(query)) for nome, query in consultas.items()},
+            progresso=progresso, parametros=parametros,
+        )
+        return {"arquivo": arquivo, "linhas": linhas}
+
+    return executar
+
+
+def _renovar_sessao():
+    """
+    Os reruns do fragmento não passam por sessao_ativa() no main: esperar o
+    relatório conta como atividade, senão o rerun completo do fim da tarefa
+    encontraria a sessão expirada.
+    """
+    sessao = st.session_state.get("sessao")
+    if sessao:
+        sessao["expira_em"] = time.time() + sessao["timeout"]
+
+
+def _arquivo_perdido(chave):
+    """Tarefa concluída cujo arquivo já não está no disco: é um cache miss, não um relatório vazio."""
+    tarefa = obter(chave)
+    return (tarefa is not None and tarefa.status == "concluida"
+            and not os.path.exists(tarefa.resultado["arquivo"]))
+
+
+@st.fragment(run_every=1)
+def _acompanhar_relatorio(chave):
+    tarefa = obter(chave)
+    if tarefa is None or not tarefa.ativa:
+        st.rerun()  # Terminou: redesenha a aba com o resultado
+
+    _renovar_sessao()
+
+    st.progress(tarefa.progresso, text=f"⏳ Gerando relatório... {tarefa.mensagem}")
+
+
+def mostrar_relatorio(chave, nome, formato):
+    tarefa = obter(chave)
+
+    if tarefa is None:
+        return
+
+    if tarefa.ativa:
+        _acompanhar_relatorio(chave)
+        return
+
+    if tarefa.status == "erro":
+        st.error(f"❌ Erro ao gerar relatório: {tarefa.erro}")
+        return
+
+    relatorio = tarefa.resultado
+    if not os.path.exists(relatorio["arquivo"]):
+        st.warning("⚠️ O arquivo deste relatório expirou. Clique em \"Gerar Relatório\" novamente.")
+        return
+
+    if not relatorio["linhas"]:
+        st.warning("⚠️ Nenhum dado encontrado para este relatório.")
+        return
+
+    st.dataframe(relatorio["previa"])
+    if relatorio["linhas"] > len(relatorio["previa"]):
+        st.caption(f"Prévia com {len(relatorio['previa'])} de {relatorio['linhas']} linhas.")
+
+    _, extensao, mime = FORMATOS[formato]
+    with open(relatorio["arquivo"], "rb") as f:
+        st.download_button(
+            label=f"📥 Baixar Relatório ({os.path.getsize(relatorio['arquivo']) / 1024:.0f} KB)",
+            data=f,
+            file_name=f"{nome.replace(' ', '_')}{extensao}",
+            mime=mime
+        )
+
+
+def mostrar_pasta_completa(chave):
+    tarefa = obter(chave)
+
+    if tarefa is None:
+        return
+
+    if tarefa.ativa:
+        _acompanhar_relatorio(chave)
+        return
+
+    if tarefa.status == "erro":
+        st.error(f"❌ Erro ao gerar a planilha: {tarefa.erro}")
+        return
+
+    pasta = tarefa.resultado
+    if not os.path.exists(pasta["arquivo"]):
+        st.warning("⚠️ O arquivo desta planilha expirou. Clique em \"Gerar Planilha Completa\" novamente.")
+        return
+
+    st.dataframe(pd.DataFrame(list(pasta["linhas"].items()), columns=["Aba", "Linhas"]), hide_index=True)
+
+    _, extensao, mime = FORMATOS["Excel (.xlsx)"]
+    with open(pasta["arquivo"], "rb") as f:
+        st.download_button(
+            label=f"📥 Baixar Planilha Completa ({os.path.getsize(pasta['arquivo']) / 1024:.0f} KB)",
+            data=f,
+            file_name=f"Relatorios_Completos{extensao}",
+            mime=mime,
+            key="baixar_pasta_completa"
+        )
+
+
+def _filtro_periodo(coluna, key="relatorio_periodo"):
+    periodo = coluna.date_input("📅 Período", value=(), format="DD/MM/YYYY", key=key)
+    if len(periodo) == 2:
+        return {"inicio": periodo[0], "fim": periodo[1]}
+    return {}
+
+
+def _filtro_unidade(coluna):
+    unidades = referencia("unidades")
+    opcoes = {"Todas": None, **dict(zip(unidades["nome"], unidades["id"]))} if not unidades.empty else {"Todas": None}
+    escolha = coluna.selectbox("🏕️ Unidade", list(opcoes), key="relatorio_unidade")
+    return {"id_unidade": opcoes[escolha]}
+
+
+def _filtro_evento(coluna):
+    eventos = referencia("evento")
+    opcoes = {"Todos": None, **dict(zip(eventos["nome"], eventos["id"]))} if not eventos.empty else {"Todos": None}
+    escolha = coluna.selectbox("🎪 Evento", list(opcoes), key="relatorio_evento")
+    return {"id_evento": opcoes[escolha]}
+
+
+# **Widget de cada filtro declarado em RELATORIOS: devolve os valores dos parâmetros**
+FILTROS = {
+    "periodo": _filtro_periodo,
+    "unidade": _filtro_unidade,
+    "evento": _filtro_evento,
+}
 
 
 def aba_extracao():
-    """Interface da aba de extração de relatórios"""
+    """Interface da aba de extração de relatórios, montada a partir de RELATORIOS"""
     st.subheader("📊 Extração de Relatórios")
 
-    # Opções de relatório
-    opcoes = [
-        "Fluxo de Caixa",
-        "Patrimônio",
-        "Livro Ata e Atos",
-        "Mensalidade",
-        "Unidades, Classes, Especialidades e Desbravadores"
-    ]
+    nome = st.selectbox("📁 Selecione o Relatório", list(RELATORIOS), key="relatorio_tipo")
+    relatorio = RELATORIOS[nome]
+
+    parametros = dict(PARAMETROS_PADRAO)
+    for coluna, filtro in zip(st.columns(len(relatorio["filtros"])), relatorio["filtros"]):
+        parametros.update(FILTROS[filtro](coluna))
+
+    formato = st.radio("Formato", list(FORMATOS), horizontal=True, key="relatorio_formato")
+
+    # O mesmo relatório, com os mesmos filtros e sobre os mesmos dados, é gerado uma vez e compartilhado entre as sessões
+    chave = (nome, tuple(parametros.items()), formato, versao_dados(*relatorio["tabelas"]))
+
+    exibido = st.session_state.get("relatorio_extracao") == chave
+    gerar = st.button("📊 Gerar Relatório")
+    if exibido and _arquivo_perdido(chave):
+        descartar(chave)  # O arquivo sumiu do disco: gera de novo em vez de mostrar um relatório vazio
+        gerar = True
+
+    if gerar:
+        query = consulta_relatorio(nome)
+
+        if query is not None:
+            submeter(chave, _gerar_artefato(query, parametros, formato),
+                     ao_descartar=lambda r: remover_arquivo(r["arquivo"]))
+            st.session_state["relatorio_extracao"] = chave
+
+    if st.session_state.get("relatorio_extracao") == chave:
+        mostrar_relatorio(chave, nome, formato)
 
-    tipo_relatorio = st.selectbox("📁 Selecione o Relatório", opcoes, key="relatorio_tipo")
+    # **Todos os relatórios em uma planilha só, uma aba por relatório**
+    st.divider()
+    st.subheader("🗂️ Exportar Tudo")
+    st.caption("Gera um único Excel com todos os relatórios acima, sem filtro de unidade ou evento.")
 
-    if st.button("📊 Gerar Relatório"):
-        df_relatorio = gerar_relatorio(tipo_relatorio)
+    parametros = {**PARAMETROS_PADRAO, **_filtro_periodo(st, key="pasta_periodo")}
+    tabelas = sorted({tabela for relatorio in RELATORIOS.values() for tabela in relatorio["tabelas"]})
+    chave = ("Planilha completa", tuple(parametros.items()), versao_dados(*tabelas))
 
-        if df_relatorio is not None and not df_relatorio.empty:
-            st.dataframe(df_relatorio)
+    exibido = st.session_state.get("pasta_extracao") == chave
+    gerar = st.button("🗂️ Gerar Planilha Completa")
+    if exibido and _arquivo_perdido(chave):
+        descartar(chave)
+        gerar = True
 
-            # Criar o arquivo Excel em memória
-            excel_data = exportar_para_excel(df_relatorio)
+    if gerar:
+        consultas = {nome: consulta_relatorio(nome) for nome in RELATORIOS}
 
-            st.download_button(
-                label="📥 Baixar Relatório",
-                data=excel_data,
-                file_name=f"{tipo_relatorio.replace(' ', '_')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-        else:
-            st.warning("⚠️ Nenhum dado encontrado para este relatório.")
+        if all(query is not None for query in consultas.values()):
+            submeter(chave, _gerar_pasta_completa(consultas, parametros),
+                     ao_descartar=lambda r: remover_arquivo(r["arquivo"]))
+            st.session_state["pasta_extracao"] = chave
 
+    if st.session_state.get("pasta_extracao") == chave:
+        mostrar_pasta_completa(chave)
@@ -0,0 +1,162 @@
+import os
+import re
+import time
+import heapq
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+import streamlit as st
+from sqlalchemy import event
+
+# **Instrumentação opcional: ative com DB_INSTRUMENTACAO=1**
+ATIVO = os.getenv('DB_INSTRUMENTACAO') == '1'
+LIMITE_N_MAIS_1 = int(os.getenv('DB_LIMITE_N_MAIS_1', '5'))  # Repetições da mesma consulta para alertar
+TOP_LENTAS = 5
+ARQUIVO_LOG = os.getenv('DB_INSTRUMENTACAO_LOG', 'logs/sql.log')
+
+_estado = threading.local()
+_logger = logging.getLogger("pontuacao_pc.sql")
+
+
+def _configurar_log():
+    if _logger.handlers:
+        return
+    os.makedirs(os.path.dirname(ARQUIVO_LOG) or ".", exist_ok=True)
+    handler = RotatingFileHandler(ARQUIVO_LOG, maxBytes=1_000_000, backupCount=5, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+
+
+def forma_consulta(sql):
+    """Normaliza o SQL para agrupar execuções da mesma consulta com valores diferentes."""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"%\(([a-zA-Z_]+?)_?\d*\)s", "?", sql)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\(\s*\?(\s*,\s*\?)*\s*\)", "(?)", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+
+def _depois(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info["inicio_consulta"].pop()
+    rerun = getattr(_estado, "rerun", None)
+    if rerun is None:
+        return  # Consulta fora de um rerun (threads de fundo, scripts)
+
+    duracao = time.perf_counter() - inicio
+    pagina = _estado.paginas[-1] if _estado.paginas else "main"
+
+    rerun["consultas"] += 1
+    rerun["tempo"] += duracao
+    rerun["formas"][forma_consulta(statement)] += 1
+
+    stats_pagina = rerun["paginas"].setdefault(pagina, {"consultas": 0, "tempo": 0.0})
+    stats_pagina["consultas"] += 1
+    stats_pagina["tempo"] += duracao
+
+    item = (duracao, pagina, " ".join(statement.split())[:300])
+    if len(rerun["lentas"]) < TOP_LENTAS:
+        heapq.heappush(rerun["lentas"], item)
+    else:
+        heapq.heappushpop(rerun["lentas"], item)
+
+
+def _erro(contexto):
+    """Consulta que falhou: descarta o início empilhado em `_antes`, que `_depois` não vai tirar."""
+    conn = contexto.connection
+    if conn is None or contexto.execution_context is None:
+        return  # Falhou antes de executar (conexão, compilação): nada foi empilhado
+    inicios = conn.info.get("inicio_consulta")
+    if inicios:
+        inicios.pop()
+
+
+def instrumentar(engine):
+    """Registra os eventos de cursor no engine para medir as consultas de cada rerun."""
+    _configurar_log()
+    event.listen(engine, "before_cursor_execute", _antes)
+    event.listen(engine, "after_cursor_execute", _depois)
+    event.listen(engine, "handle_error", _erro)
+
+
+def _finalizar(rerun):
+    resumo = {
+        "consultas": rerun["consultas"],
+        "tempo": rerun["tempo"],
+        "duracao_rerun": time.perf_counter() - rerun["inicio"],
+        "paginas": rerun["paginas"],
+        "lentas": sorted(rerun["lentas"], reverse=True),
+        "n_mais_1": [(forma, n) for forma, n in rerun["formas"].most_common() if n >= LIMITE_N_MAIS_1],
+    }
+
+    _logger.info("rerun consultas=%d tempo_db=%.3fs duracao=%.3fs paginas=%s",
+                 resumo["consultas"], resumo["tempo"], resumo["duracao_rerun"],
+                 {p: s["consultas"] for p, s in resumo["paginas"].items()})
+    for forma, n in resumo["n_mais_1"]:
+        _logger.warning("N+1 %dx: %s", n, forma[:300])
+
+    return resumo
+
+
+@contextmanager
+def rerun_instrumentado():
+    """Delimita um rerun do Streamlit; ao final registra o resumo e mostra o painel para administradores."""
+    if not ATIVO:
+        yield
+        return
+
+    _estado.rerun = {"inicio": time.perf_counter(), "consultas": 0, "tempo": 0.0,
+                     "formas": Counter(), "paginas": {}, "lentas": []}
+    _estado.paginas = []
+    concluido = False
+    try:
+        yield
+        concluido = True
+    finally:
+        rerun, _estado.rerun = _estado.rerun, None
+        resumo = _finalizar(rerun)
+        st.session_state.resumo_sql = resumo
+        if concluido and st.session_state.get("painel_sql", False):
+            painel_sql(resumo)
+
+
+@contextmanager
+def pagina(nome):
+    """Atribui as consultas executadas dentro do bloco à página informada."""
+    if not ATIVO or getattr(_estado, "rerun", None) is None:
+        yield
+        return
+
+    _estado.paginas.append(nome)
+    try:
+        yield
+    finally:
+        _estado.paginas.pop()
+
+
+def painel_sql(resumo):
+    with st.sidebar.expander("🛠️ Consultas SQL deste rerun"):
+        st.write(f"**Consultas:** {resumo['consultas']} — **Tempo no banco:** {resumo['tempo'] * 1000:.1f} ms "
+                 f"de {resumo['duracao_rerun'] * 1000:.0f} ms")
+
+        if resumo["paginas"]:
+            st.dataframe(
+                [{"Página": p, "Consultas": s["consultas"], "Tempo (ms)": round(s["tempo"] * 1000, 1)}
+                 for p, s in resumo["paginas"].items()],
+                hide_index=True
+            )
+
+        for forma, n in resumo["n_mais_1"]:
+            st.warning(f"⚠️ N+1: consulta repetida {n}x\n\n`{forma[:200]}`")
+
+        if resumo["lentas"]:
+            st.write("**Mais lentas:**")
+            for duracao, nome_pagina, sql in resumo["lentas"]:
+                st.caption(f"{duracao * 1000:.1f} ms · {nome_pagina} · {sql}")
@@ -0,0 +1,186 @@
+from datetime import date
+from sqlalchemy import select, update, func, extract, cast, exists, literal_column, and_, true, bindparam, DateTime, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from pgs.db import tables
+
+
+def limites_do_mes(ano, mes):
+    """Intervalo [início, fim) de um mês, para filtrar `caixa.data` usando o índice."""
+    return date(ano, mes, 1), date(ano + mes // 12, mes % 12 + 1, 1)
+
+
+def _totais_do_caixa(caixa):
+    return (
+        func.coalesce(func.sum(caixa.c.valor).filter(caixa.c.tipo == "Entrada"), 0),
+        func.coalesce(func.sum(caixa.c.valor).filter(caixa.c.tipo == "Saída"), 0),
+    )
+
+
+def movimento_do_mes(session, ano, mes):
+    """(entradas, saídas) lançadas no caixa em um mês."""
+    caixa = tables.get("caixa")
+    inicio, fim = limites_do_mes(ano, mes)
+
+    return tuple(session.execute(
+        select(*_totais_do_caixa(caixa)).where(caixa.c.data >= inicio, caixa.c.data < fim)
+    ).one())
+
+
+def fechar_mes(session, ano, mes):
+    """
+    Fecha um mês com os totais atuais do caixa. Se o mês já estiver fechado
+    (por exemplo, um segundo clique), apenas regrava os totais. Retorna
+    (entradas, saídas). A transação fica a cargo de quem chama.
+    """
+    fechamento = tables.get("fechamento")
+    entrada, saida = movimento_do_mes(session, ano, mes)
+
+    stmt = pg_insert(fechamento).values(ano=ano, mes=mes, entrada=entrada, saida=saida)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["ano", "mes"],
+        set_={"entrada": stmt.excluded.entrada, "saida": stmt.excluded.saida},
+    ))
+    return entrada, saida
+
+
+def _meses_sem_fechamento(caixa, fechamento, ate):
+    """Inícios dos meses, do primeiro lançamento do caixa até antes de `ate`, que não têm fechamento."""
+    primeiro_mes = select(func.date_trunc("month", func.min(caixa.c.data))).scalar_subquery()
+    meses = (
+        func.generate_series(primeiro_mes, ate - literal_column("interval '1 month'"),
+                             literal_column("interval '1 month'"))
+        .table_valued("inicio")
+        .render_derived(name="meses")
+    )
+
+    ano = cast(extract("year", meses.c.inicio), Integer)
+    mes = cast(extract("month", meses.c.inicio), Integer)
+    return meses, ano, mes, ~exists().where(fechamento.c.ano == ano, fechamento.c.mes == mes)
+
+
+def fechar_meses(session, ate=None):
+    """
+    Fecha de uma vez todos os meses anteriores a `ate` (padrão: o mês atual)
+    que ainda não têm fechamento, desde o primeiro lançamento do caixa.
+
+    Meses sem movimento também são fechados, com totais zerados, para que o
+    livro não tenha lacunas. Retorna quantos meses foram fechados. A transação
+    fica a cargo de quem chama.
+    """
+    caixa = tables.get("caixa")
+    fechamento = tables.get("fechamento")
+
+    ate = ate or date.today()
+    limite = date(ate.year, ate.month, 1)
+
+    meses, ano, mes, sem_fechamento = _meses_sem_fechamento(caixa, fechamento, func.date_trunc("month", limite))
+
+    inicio_mes = func.date_trunc("month", caixa.c.data)
+    entrada, saida = _totais_do_caixa(caixa)
+    movimento = (
+        select(inicio_mes.label("inicio"), entrada.label("entrada"), saida.label("saida"))
+        .where(caixa.c.data < limite)
+        .group_by(inicio_mes)
+        .subquery("movimento")
+    )
+
+    consulta = (
+        select(ano, mes, func.coalesce(movimento.c.entrada, 0), func.coalesce(movimento.c.saida, 0))
+        .select_from(meses.outerjoin(movimento, movimento.c.inicio == meses.c.inicio))
+        .where(sem_fechamento)
+    )
+
+    result = session.execute(
+        pg_insert(fechamento)
+        .from_select(["ano", "mes", "entrada", "saida"], consulta)
+        .on_conflict_do_nothing(index_elements=["ano", "mes"])
+    )
+    return result.rowcount
+
+
+def recalcular_fechamentos(session, periodos):
+    """
+    Atualiza os totais dos meses já fechados em `periodos` (lista de (ano, mes))
+    a partir do caixa. Deve ser chamada quando um lançamento cai em um mês que
+    pode já ter sido fechado; meses abertos são ignorados.
+    """
+    caixa = tables.get("caixa")
+    fechamento = tables.get("fechamento")
+
+    if caixa is None or fechamento is None:
+        return
+
+    for ano, mes in set(periodos):
+        inicio, fim = limites_do_mes(ano, mes)
+        entrada, saida = [
+            select(total).where(caixa.c.data >= inicio, caixa.c.data < fim).scalar_subquery()
+            for total in _totais_do_caixa(caixa)
+        ]
+        session.execute(
+            update(fechamento)
+            .where(fechamento.c.ano == ano, fechamento.c.mes == mes)
+            .values(entrada=entrada, saida=saida)
+        )
+
+
+def livro_caixa(session):
+    """
+    Fechamentos em ordem cronológica com o saldo de cada mês e o saldo
+    acumulado, calculado por uma função de janela sobre `fechamento`.
+    """
+    fechamento = tables.get("fechamento")
+    saldo_mes = fechamento.c.entrada - fechamento.c.saida
+
+    return session.execute(
+        select(
+            fechamento.c.ano,
+            fechamento.c.mes,
+            fechamento.c.entrada,
+            fechamento.c.saida,
+            saldo_mes.label("saldo_mes"),
+            func.sum(saldo_mes).over(order_by=[fechamento.c.ano, fechamento.c.mes]).label("saldo_acumulado"),
+        )
+        .order_by(fechamento.c.ano, fechamento.c.mes)
+    ).fetchall()
+
+
+def saldo_atual(session):
+    """
+    (entradas, saídas) de todo o histórico: a soma dos fechamentos, mais o
+    movimento do caixa posterior ao último mês fechado, mais o dos meses
+    anteriores a ele que ficaram sem fechamento. O custo cresce com o número
+    de meses e com os lançamentos dos meses abertos, não com o histórico todo.
+    """
+    caixa = tables.get("caixa")
+    fechamento = tables.get("fechamento")
+
+    entrada, saida, aberto_desde = session.execute(
+        select(
+            func.coalesce(func.sum(fechamento.c.entrada), 0),
+            func.coalesce(func.sum(fechamento.c.saida), 0),
+            func.max(func.make_date(fechamento.c.ano, fechamento.c.mes, 1)) + literal_column("interval '1 month'"),
+        )
+    ).one()
+
+    # Depois do último fechamento (ou tudo, se nenhum mês foi fechado)
+    posterior = caixa.c.data >= aberto_desde if aberto_desde is not None else true()
+    entrada_aberta, saida_aberta = session.execute(select(*_totais_do_caixa(caixa)).where(posterior)).one()
+    entrada += entrada_aberta
+    saida += saida_aberta
+
+    if aberto_desde is not None:
+        # Lacunas: meses anteriores ao último fechamento que nunca foram fechados
+        meses, _, _, sem_fechamento = _meses_sem_fechamento(
+            caixa, fechamento, bindparam("aberto_desde", aberto_desde, type_=DateTime))
+        lacunas = select(meses.c.inicio).where(sem_fechamento).subquery("lacunas")
+
+        entrada_lacunas, saida_lacunas = session.execute(
+            select(*_totais_do_caixa(caixa)).select_from(
+                caixa.join(lacunas, and_(caixa.c.data >= lacunas.c.inicio,
+                                         caixa.c.data < lacunas.c.inicio + literal_column("interval '1 month'")))
+            )
+        ).one()
+        entrada += entrada_lacunas
+        saida += saida_lacunas
+
+    return entrada, saida
@@ -0,0 +1,63 @@
+import streamlit as st
+from sqlalchemy import tuple_
+
+# **Linhas por página nas listagens paginadas**
+TAMANHO_PAGINA = 50
+
+
+def estimar_linhas(session, stmt, parametros=None):
+    """Estimativa do planejador (EXPLAIN) para o número de linhas da consulta, sem executá-la."""
+    compilado = stmt.compile(dialect=session.bind.dialect)
+    plano = session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compilado.string}", compilado.construct_params(parametros)
+    ).scalar()
+    return int(plano[0]["Plan"]["Plan Rows"])
+
+
+def paginar(session, stmt, chaves, chave_estado, filtros, tamanho=TAMANHO_PAGINA):
+    """
+    Paginação por chave (keyset): busca a página atual de `stmt` em ordem
+    decrescente de `chaves`, continuando a partir da última linha da página
+    anterior em vez de usar OFFSET.
+
+    As colunas de `chaves` precisam estar no SELECT. A posição fica em
+    st.session_state[chave_estado] e volta à primeira página quando `filtros`
+    muda. Retorna (linhas, cursor da próxima página ou None).
+    """
+    estado = st.session_state.get(chave_estado)
+    if estado is None or estado["filtros"] != filtros:
+        estado = {"filtros": filtros, "cursores": [None]}
+        st.session_state[chave_estado] = estado
+
+    cursor = estado["cursores"][-1]
+    if cursor is not None:
+        stmt = stmt.where(tuple_(*chaves) < tuple_(*cursor))
+
+    linhas = session.execute(
+        stmt.order_by(*[chave.desc() for chave in chaves]).limit(tamanho + 1)
+    ).fetchall()
+
+    proximo = None
+    if len(linhas) > tamanho:
+        linhas = linhas[:tamanho]
+        proximo = tuple(linhas[-1]._mapping[chave] for chave in chaves)
+
+    return linhas, proximo
+
+
+def controles_paginacao(chave_estado, proximo):
+    """Botões de página anterior/próxima para uma listagem feita com `paginar`."""
+    estado = st.session_state[chave_estado]
+
+    def anterior():
+        estado["cursores"].pop()
+
+    def seguinte():
+        estado["cursores"].append(proximo)
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    col1.button("⬅️ Anterior", key=f"{chave_estado}_anterior", on_click=anterior,
+                disabled=len(estado["cursores"]) == 1)
+    col2.button("Próxima ➡️", key=f"{chave_estado}_proxima", on_click=seguinte,
+                disabled=proximo is None)
+    col3.caption(f"Página {len(estado['cursores'])}")
@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import insert, select, update, delete
 import streamlit as st
 from pgs.db import engine, tables
+from pgs.cache import referencia, invalidar
 import pandas as pd
 
 
@@ -36,6 +37,7 @@ def add_item():
             )
             session.execute(stmt)
             session.commit()
+        invalidar("patrimonio")
 
         st.success(f"✅ Item '{nome}' adicionado com sucesso!")
         st.rerun()
@@ -55,14 +57,12 @@ def view_items():
 
     st.subheader("📋 Itens no Patrimônio")
 
-    with Session(engine) as session:
-        result = session.execute(select(patrimonio).order_by(patrimonio.c.nome)).fetchall()
+    df = referencia("patrimonio")
 
-    if not result:
+    if df.empty:
         st.info("📌 Nenhum item cadastrado no patrimônio.")
     else:
-        df = pd.DataFrame(result, columns=patrimonio.c.keys())
-        st.dataframe(df)
+        st.dataframe(df.sort_values("nome"))
 
 
 def editar_remover_item():
@@ -80,15 +80,12 @@ def editar_remover_item():
     st.subheader("✏️ Editar ou Remover Item do Patrimônio")
 
     # Buscar todos os itens cadastrados
-    with Session(engine) as session:
-        result = session.execute(select(patrimonio)).fetchall()
+    df = referencia("patrimonio")
 
-    if not result:
+    if df.empty:
         st.warning("⚠️ Nenhum item encontrado para edição ou remoção.")
         return
 
-    df = pd.DataFrame(result, columns=patrimonio.c.keys())
-
     # Criar dicionário {Nome (ID) -> ID}
     item_dict = {f"{row['nome']} (ID {row['id']})": row['id'] for _, row in df.iterrows()}
     item_selecionado = st.selectbox("Selecione um item", list(item_dict.keys()))
@@ -116,6 +113,7 @@ def editar_remover_item():
             )
             session.execute(stmt)
             session.commit()
+        invalidar("patrimonio")
 
         st.success(f"✅ Item '{novo_nome}' atualizado com sucesso!")
         st.rerun()
@@ -126,6 +124,7 @@ def editar_remover_item():
             stmt = delete(patrimonio).where(patrimonio.c.id == item_id)
             session.execute(stmt)
             session.commit()
+        invalidar("patrimonio")
 
         st.warning(f"⚠️ Item '{item_info['nome']}' foi removido do patrimônio.")
         st.rerun()
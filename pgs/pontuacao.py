@@ -1,59 +1,135 @@
 import streamlit as st
 import pandas as pd
+from datetime import date
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import select
+from sqlalchemy.sql import select, delete, func, extract, cast
+from sqlalchemy import Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from pgs.db import engine, tables
 
 
+def periodo_da_data(data):
+    """(ano, mes) de uma data de reunião."""
+    data = pd.Timestamp(data)
+    return int(data.year), int(data.month)
+
+
+def recalcular_resumo(session, periodos=None, unidades=None):
+    """
+    Recalcula a tabela `pontuacao_resumo` a partir de `chamadas`.
+
+    Com `periodos` (lista de (ano, mes)) refaz apenas esses meses, o que é
+    chamado a cada chamada salva; sem ele reconstrói todo o histórico. Com
+    `unidades` (lista de ids) refaz apenas as linhas dessas unidades, para que
+    chamadas de unidades diferentes salvas ao mesmo tempo não mexam nas linhas
+    umas das outras. A gravação é um upsert, então duas transações refazendo a
+    mesma linha não falham na chave primária. A transação fica a cargo de quem
+    chama.
+    """
+    resumo = tables.get("pontuacao_resumo")
+    chamadas = tables.get("chamadas")
+    reunioes = tables.get("reunioes")
+
+    if resumo is None or chamadas is None or reunioes is None:
+        print("⚠️ Tabela 'pontuacao_resumo' não encontrada. Rode: python manutencao.py migrar")
+        return
+
+    ano = cast(extract("year", reunioes.c.data), Integer)
+    mes = cast(extract("month", reunioes.c.data), Integer)
+
+    for periodo in (set(periodos) if periodos is not None else [None]):
+        consulta = (
+            select(
+                chamadas.c.id_unidade, ano, mes,
+                func.coalesce(func.sum(chamadas.c.presenca), 0),
+                func.coalesce(func.sum(chamadas.c.pontualidade), 0),
+                func.coalesce(func.sum(chamadas.c.uniforme), 0),
+                func.coalesce(func.sum(chamadas.c.modestia), 0),
+            )
+            .join(reunioes, chamadas.c.reuniao_id == reunioes.c.id)
+            .group_by(chamadas.c.id_unidade, ano, mes)
+        )
+        apagar = delete(resumo)
+
+        if periodo is not None:
+            inicio = date(periodo[0], periodo[1], 1)
+            fim = date(periodo[0] + periodo[1] // 12, periodo[1] % 12 + 1, 1)
+            consulta = consulta.where(reunioes.c.data >= inicio, reunioes.c.data < fim)
+            apagar = apagar.where(resumo.c.ano == periodo[0], resumo.c.mes == periodo[1])
+
+        if unidades is not None:
+            consulta = consulta.where(chamadas.c.id_unidade.in_(unidades))
+            apagar = apagar.where(resumo.c.id_unidade.in_(unidades))
+
+        inserir = pg_insert(resumo).from_select(
+            ["id_unidade", "ano", "mes", "presenca", "pontualidade", "uniforme", "modestia"], consulta
+        )
+        session.execute(apagar)
+        session.execute(
+            inserir.on_conflict_do_update(
+                index_elements=["id_unidade", "ano", "mes"],
+                set_={nome: inserir.excluded[nome] for nome in ("presenca", "pontualidade", "uniforme", "modestia")},
+            )
+        )
+
+
+METRICAS = ["Presenca", "Pontualidade", "Uniforme", "Modestia"]
+
+
+def calcular_pontuacao(df):
+    """
+    Calcula, em uma única agregação por (unidade, ano, mês), os totais mensais
+    e o ranking geral das unidades.
+
+    `df` precisa das colunas Unidade_Nome, Ano, Mes e das métricas; pode ser o
+    resumo mensal ou as chamadas linha a linha.
+    Retorna (ranking, mensal), ambos com a coluna Total_Geral.
+    """
+    mensal = df.groupby(["Unidade_Nome", "Ano", "Mes"])[METRICAS].sum()
+    mensal["Total_Geral"] = mensal.sum(axis=1)
+
+    ranking = mensal.groupby(level="Unidade_Nome").sum()
+    ranking = ranking.sort_values(by="Total_Geral", ascending=False)
+
+    return ranking, mensal
+
+
 def show_pontos():
 
     if not engine:
         st.error("❌ Erro ao conectar ao banco de dados.")
         return
 
-    chamadas = tables.get("chamadas")
-    reunioes = tables.get("reunioes")
+    resumo = tables.get("pontuacao_resumo")
     unidades = tables.get("unidades")
 
-    if chamadas is None or reunioes is None or unidades is None:
-        st.error("❌ Algumas tabelas não foram encontradas no banco de dados.")
+    if resumo is None or unidades is None:
+        st.error("❌ A tabela 'pontuacao_resumo' não foi encontrada. Rode: python manutencao.py migrar")
         return
 
+    # Totais já agregados por unidade e mês
     with Session(engine) as session:
-        chamadas_query = session.execute(
+        resumo_query = session.execute(
             select(
-                chamadas.c.id,
-                chamadas.c.reuniao_id,
-                reunioes.c.nome.label("Reuniao_Nome"),
-                reunioes.c.data.label("Data"),
                 unidades.c.nome.label("Unidade_Nome"),
-                chamadas.c.id_unidade,
-                chamadas.c.presenca,
-                chamadas.c.pontualidade,
-                chamadas.c.uniforme,
-                chamadas.c.modestia
-            ).join(reunioes, chamadas.c.reuniao_id == reunioes.c.id)
-             .join(unidades, chamadas.c.id_unidade == unidades.c.id)
+                resumo.c.ano,
+                resumo.c.mes,
+                resumo.c.presenca,
+                resumo.c.pontualidade,
+                resumo.c.uniforme,
+                resumo.c.modestia
+            ).join(unidades, resumo.c.id_unidade == unidades.c.id)
         ).fetchall()
 
-        df = pd.DataFrame(chamadas_query, columns=[
-            "ID", "Reuniao_ID", "Reuniao_Nome", "Data", "Unidade_Nome", "ID_Unidade",
-            "Presenca", "Pontualidade", "Uniforme", "Modestia"
+        df = pd.DataFrame(resumo_query, columns=[
+            "Unidade_Nome", "Ano", "Mes", "Presenca", "Pontualidade", "Uniforme", "Modestia"
         ])
 
     if df.empty:
         st.info("ℹ️ Nenhuma chamada registrada ainda.")
         return
 
-    # Convertendo a coluna de data
-    df["Data"] = pd.to_datetime(df["Data"])
-    df["Ano"] = df["Data"].dt.year
-    df["Mes"] = df["Data"].dt.month
-
-    # Criar ranking geral
-    ranking = df.groupby("Unidade_Nome")[["Presenca", "Pontualidade", "Uniforme", "Modestia"]].sum()
-    ranking["Total_Geral"] = ranking.sum(axis=1)
-    ranking = ranking.sort_values(by="Total_Geral", ascending=False)
+    ranking, mensal = calcular_pontuacao(df)
 
     st.subheader("📌 Ranking Geral das Unidades")
 
@@ -68,37 +144,23 @@ def show_pontos():
     if len(top_3) > 2:
         col3.metric(label=f"🥉 {top_3.iloc[2, 0]}", value=top_3.iloc[2, -1])
 
-    for unidade in df["Unidade_Nome"].unique():
-        df_unidade = df[df["Unidade_Nome"] == unidade]
-        total_presenca_unidade = df_unidade["Presenca"].sum()
-        total_pontualidade_unidade = df_unidade["Pontualidade"].sum()
-        total_uniforme_unidade = df_unidade["Uniforme"].sum()
-        total_modestia_unidade = df_unidade["Modestia"].sum()
-        total_geral_unidade = total_presenca_unidade + total_pontualidade_unidade + total_uniforme_unidade + total_modestia_unidade
-
+    for unidade, totais in ranking.iterrows():
         st.subheader(f"📍 Unidade: {unidade}")
 
         # Resumo geral da unidade
         col1, col2, col3, col4, col5 = st.columns(5)
-        col1.metric("✅ Presença", total_presenca_unidade)
-        col2.metric("⏰ Pontualidade", total_pontualidade_unidade)
-        col3.metric("👔 Uniforme", total_uniforme_unidade)
-        col4.metric("🧥 Modéstia", total_modestia_unidade)
-        col5.metric("🏆 Total", total_geral_unidade)
-
-        # Detalhamento por mês
-        for mes in sorted(df_unidade["Mes"].unique(), reverse=True):  # Ordenado do mais recente para o mais antigo
-            df_mes = df_unidade[df_unidade["Mes"] == mes]
-            total_presenca = df_mes["Presenca"].sum()
-            total_pontualidade = df_mes["Pontualidade"].sum()
-            total_uniforme = df_mes["Uniforme"].sum()
-            total_modestia = df_mes["Modestia"].sum()
-            total_geral = total_presenca + total_pontualidade + total_uniforme + total_modestia
-
-            with st.expander(f"📆 Mês {mes}"):
+        col1.metric("✅ Presença", totais["Presenca"])
+        col2.metric("⏰ Pontualidade", totais["Pontualidade"])
+        col3.metric("👔 Uniforme", totais["Uniforme"])
+        col4.metric("🧥 Modéstia", totais["Modestia"])
+        col5.metric("🏆 Total", totais["Total_Geral"])
+
+        # Detalhamento por mês, do mais recente para o mais antigo
+        for (ano, mes), totais_mes in mensal.loc[unidade].sort_index(ascending=False).iterrows():
+            with st.expander(f"📆 {mes:02d}/{ano}"):
                 col1, col2, col3, col4, col5 = st.columns(5)
-                col1.metric("✅ Presença", total_presenca)
-                col2.metric("⏰ Pontualidade", total_pontualidade)
-                col3.metric("👔 Uniforme", total_uniforme)
-                col4.metric("🧥 Modéstia", total_modestia)
-                col5.metric("🏆 Total", total_geral)
+                col1.metric("✅ Presença", totais_mes["Presenca"])
+                col2.metric("⏰ Pontualidade", totais_mes["Pontualidade"])
+                col3.metric("👔 Uniforme", totais_mes["Uniforme"])
+                col4.metric("🧥 Modéstia", totais_mes["Modestia"])
+                col5.metric("🏆 Total", totais_mes["Total_Geral"])
@@ -3,6 +3,7 @@ from sqlalchemy import select, update, delete, insert
 import pandas as pd
 import streamlit as st
 from pgs.db import get_db, engine, tables
+from pgs.cache import referencia, invalidar
 import pandas as pd
 
 
@@ -22,9 +23,8 @@ def solicitar_item():
 
     st.subheader("📌 Solicitação de Materiais")
 
-    with Session(engine) as session:
-        itens = session.execute(select(patrimonio)).mappings().all()
-        reunioes = session.execute(select(reunioes_table)).mappings().all()
+    itens = referencia("patrimonio").to_dict(orient="records")
+    reunioes = referencia("reunioes").to_dict(orient="records")
 
     if not itens:
         st.warning("⚠️ Nenhum item disponível para solicitação.")
@@ -184,6 +184,7 @@ def gerenciar_solicitacoes():
                 session.execute(stmt)
 
             session.commit()
+            invalidar("patrimonio")
             st.success(f"✅ Status atualizado para **{novo_status}**!")
             st.rerun()
 
@@ -280,16 +281,15 @@ def gerenciar_solicitacoes_internas():
 
     st.subheader("📌 Gerenciar Solicitações Internas")
 
-    with Session(engine) as session:
-        # Buscar reuniões disponíveis
-        reunioes_query = session.execute(select(reunioes.c.id, reunioes.c.nome)).fetchall()
+    # Buscar reuniões disponíveis
+    reunioes_df = referencia("reunioes")
 
-    if not reunioes_query:
+    if reunioes_df.empty:
         st.warning("⚠️ Nenhuma reunião cadastrada.")
         return
 
     # Criar lista de reuniões para o selectbox
-    reuniao_opcoes = {str(r.id): r.nome for r in reunioes_query}
+    reuniao_opcoes = {str(r.id): r.nome for r in reunioes_df.itertuples()}
     reuniao_selecionada = st.selectbox("Selecione uma Reunião", list(reuniao_opcoes.values()), key="select_reuniao")
 
     # Obter o ID da reunião selecionada
@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# **Tarefas executadas ao mesmo tempo e artefatos mantidos em memória**
+TAREFAS_SIMULTANEAS = int(os.getenv('TAREFAS_SIMULTANEAS', '2'))
+MAX_ARTEFATOS = int(os.getenv('TAREFAS_MAX_ARTEFATOS', '20'))
+TTL_ARTEFATOS = int(os.getenv('TAREFAS_TTL_ARTEFATOS', '600'))  # Segundos
+
+_executor = ThreadPoolExecutor(max_workers=TAREFAS_SIMULTANEAS, thread_name_prefix="tarefas")
+_tarefas = OrderedDict()  # chave -> Tarefa, da menos para a mais recentemente usada
+_lock = threading.Lock()
+
+
+class Tarefa:
+    """
+    Uma execução em segundo plano, compartilhada por todas as sessões que
+    pedirem a mesma chave.
+
+    A função executada pode atualizar `progresso` (0 a 1) e `mensagem`; ao
+    terminar, `resultado` (ou `erro`) fica disponível até a tarefa expirar.
+    """
+
+    def __init__(self, chave, ao_descartar=None):
+        self.chave = chave
+        self.status = "na fila"
+        self.progresso = 0.0
+        self.mensagem = ""
+        self.resultado = None
+        self.erro = None
+        self.concluida_em = None
+        self.ao_descartar = ao_descartar
+
+    @property
+    def ativa(self):
+        return self.status in ("na fila", "executando")
+
+    def _valida(self):
+        if self.ativa:
+            return True
+        return self.status == "concluida" and time.time() - self.concluida_em < TTL_ARTEFATOS
+
+    def _descartar(self):
+        if self.ao_descartar and self.resultado is not None:
+            self.ao_descartar(self.resultado)
+
+
+def _executar(tarefa, funcao):
+    tarefa.status = "executando"
+    try:
+        tarefa.resultado = funcao(tarefa)
+        tarefa.status = "concluida"
+    except Exception as e:
+        tarefa.erro = e
+        tarefa.status = "erro"
+    tarefa.progresso = 1.0
+    tarefa.concluida_em = time.time()
+
+
+def _limpar():
+    """Descarta tarefas expiradas e as mais antigas além de MAX_ARTEFATOS (nunca as em andamento)."""
+    concluidas = [t for t in _tarefas.values() if not t.ativa]
+    excesso = len(_tarefas) - MAX_ARTEFATOS
+
+    for tarefa in concluidas:
+        if excesso > 0 or not tarefa._valida():
+            del _tarefas[tarefa.chave]
+            tarefa._descartar()
+            excesso -= 1
+
+
+def submeter(chave, funcao, ao_descartar=None):
+    """
+    Executa `funcao(tarefa)` no pool de segundo plano e devolve a Tarefa.
+
+    Pedidos com a mesma chave enquanto a tarefa está em andamento recebem a
+    mesma execução; depois de concluída, o resultado é reaproveitado até
+    expirar. `ao_descartar(resultado)` é chamada quando o resultado sai do
+    cache (por exemplo, para apagar um arquivo temporário).
+    """
+    with _lock:
+        _limpar()
+
+        tarefa = _tarefas.get(chave)
+        if tarefa is not None and tarefa._valida():
+            _tarefas.move_to_end(chave)
+            return tarefa
+
+        if tarefa is not None:
+            tarefa._descartar()  # Terminou com erro: tenta de novo
+
+        tarefa = Tarefa(chave, ao_descartar)
+        _tarefas[chave] = tarefa
+
+    _executor.submit(_executar, tarefa, funcao)
+    return tarefa
+
+
+def descartar(chave):
+    """Tira a tarefa do cache (por exemplo, se o arquivo dela sumiu); o próximo `submeter` executa de novo."""
+    with _lock:
+        tarefa = _tarefas.get(chave)
+        if tarefa is None or tarefa.ativa:
+            return
+        del _tarefas[chave]
+    tarefa._descartar()
+
+
+def obter(chave):
+    """Tarefa registrada para a chave, ou None se não existe ou já expirou."""
+    with _lock:
+        tarefa = _tarefas.get(chave)
+        return tarefa if tarefa is not None and (tarefa._valida() or tarefa.status == "erro") else None
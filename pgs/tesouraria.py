@@ -1,9 +1,77 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, date, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import select, insert, update, func, delete
-from pgs.db import get_db, engine, tables
+from sqlalchemy import (select, insert, update, func, delete, literal, exists, true, null,
+                        union_all, cast, String, Integer, tuple_, bindparam)
+from pgs.db import get_db, engine, tables, consultar_em_paralelo
+from pgs.cache import referencia, invalidar, versao_dados, TTL_REFERENCIAS
+from pgs.livro_caixa import (fechar_meses, fechar_mes, recalcular_fechamentos, livro_caixa, saldo_atual,
+                              movimento_do_mes)
+from pgs.pontuacao import periodo_da_data
+from pgs.paginacao import paginar, estimar_linhas, controles_paginacao
+from pgs.exportacao import download_csv
+
+
+def gerar_mensalidades(session, ano_inicio, ano_fim, valor):
+    """
+    Gera as mensalidades de todos os meses de `ano_inicio` a `ano_fim` e as
+    cobranças de cada Desbravador em uma única instrução: uma série de meses
+    cruzada com a lista de Desbravadores.
+
+    É idempotente: meses e cobranças já existentes são mantidos, então rodar
+    de novo só completa o que falta (por exemplo, membros novos).
+    Retorna (mensalidades criadas, cobranças criadas). A transação fica a
+    cargo de quem chama.
+    """
+    mensalidades = tables.get("mensalidades")
+    membros = tables.get("membros")
+    user_mensalidades = tables.get("user_mensalidades")
+
+    # Serializa execuções simultâneas para que o NOT EXISTS continue valendo
+    session.execute(select(func.pg_advisory_xact_lock(func.hashtext("gerar_mensalidades"))))
+
+    anos = func.generate_series(ano_inicio, ano_fim).table_valued("ano").render_derived(name="anos")
+    meses = func.generate_series(1, 12).table_valued("mes").render_derived(name="meses")
+
+    novas = (
+        insert(mensalidades)
+        .from_select(
+            ["valor", "ano", "mes"],
+            select(literal(valor, mensalidades.c.valor.type), anos.c.ano, meses.c.mes)
+            .select_from(anos.join(meses, true()))
+            .where(~exists().where(mensalidades.c.ano == anos.c.ano, mensalidades.c.mes == meses.c.mes))
+        )
+        .returning(mensalidades.c.id)
+        .cte("novas")
+    )
+
+    # Mensalidades do período: as que já existiam mais as recém-criadas
+    alvo = union_all(
+        select(mensalidades.c.id).where(mensalidades.c.ano.between(ano_inicio, ano_fim)),
+        select(novas.c.id),
+    ).cte("alvo")
+
+    atribuidas = (
+        insert(user_mensalidades)
+        .from_select(
+            ["id_mensalidade", "codigo_sgc", "status"],
+            select(alvo.c.id, membros.c.codigo_sgc, literal("Pendente"))
+            .select_from(alvo.join(membros, true()))
+            .where(membros.c.cargo == "Desbravador")
+            .where(~exists().where(user_mensalidades.c.id_mensalidade == alvo.c.id,
+                                   user_mensalidades.c.codigo_sgc == membros.c.codigo_sgc))
+        )
+        .returning(user_mensalidades.c.id_mensalidade)
+        .cte("atribuidas")
+    )
+
+    return tuple(session.execute(
+        select(
+            select(func.count()).select_from(novas).scalar_subquery(),
+            select(func.count()).select_from(atribuidas).scalar_subquery(),
+        )
+    ).one())
 
 
 def criar_mensalidades():
@@ -23,52 +91,22 @@ def criar_mensalidades():
     st.subheader("📌 Criar Mensalidades")
 
     # Entrada de dados para a mensalidade
-    ano = st.number_input("Ano", min_value=2024, max_value=2100, value=datetime.now().year, step=1)
+    col1, col2 = st.columns(2)
+    ano_inicio = col1.number_input("Ano", min_value=2024, max_value=2100, value=datetime.now().year, step=1)
+    ano_fim = col2.number_input("Até o ano", min_value=int(ano_inicio), max_value=2100, value=int(ano_inicio), step=1)
     valor = st.number_input("Valor da Mensalidade", min_value=0.0, format="%.2f")
 
     if st.button("💾 Criar Mensalidades do Ano"):
         with Session(engine) as session:
             try:
-                # Criar mensalidades para os 12 meses do ano selecionado
-                for mes in range(1, 13):
-                    result = session.execute(
-                        insert(mensalidades)
-                        .values(valor=valor, ano=ano, mes=mes)
-                        .returning(mensalidades.c.id)
-                    )
-                    id_mensalidade = result.scalar()
-
-                    if not id_mensalidade:
-                        st.error(f"❌ Erro ao criar mensalidade para {mes}/{ano}. ID nulo.")
-                        session.rollback()
-                        continue  # Pula para o próximo mês
-
-                    st.success(f"✅ Mensalidade criada {mes}/{ano} - ID: {id_mensalidade}")
-
-                    # 🚀 Confirma a inserção no banco antes de buscar membros
-                    session.flush()
-
-                    # Buscar todos os membros com cargo "Desbravador"
-                    membros_query = session.execute(
-                        select(membros.c.codigo_sgc).where(membros.c.cargo == "Desbravador")
-                    ).fetchall()
-
-                    if not membros_query:
-                        st.warning(f"⚠️ Nenhum membro encontrado para {mes}/{ano}.")
-                        continue  # Pula para o próximo mês
-
-                    # Criar mensalidade para cada membro
-                    session.execute(
-                        insert(user_mensalidades).values([
-                            {"id_mensalidade": id_mensalidade, "codigo_sgc": membro[0], "status": "Pendente"}
-                            for membro in membros_query
-                        ])
-                    )
-
-                    st.success(f"✅ Mensalidades atribuídas para {mes}/{ano}.")
-
-                # Confirma todas as operações no final
+                criadas, atribuidas = gerar_mensalidades(session, int(ano_inicio), int(ano_fim), valor)
                 session.commit()
+                invalidar("mensalidades", "user_mensalidades")
+
+                st.success(f"✅ {criadas} mensalidades criadas e {atribuidas} cobranças atribuídas "
+                           f"({ano_inicio}–{ano_fim}).")
+                if criadas == 0 and atribuidas == 0:
+                    st.info("📌 As mensalidades deste período já estavam geradas.")
 
             except Exception as e:
                 session.rollback()
@@ -98,10 +136,32 @@ def criar_eventos():
                 insert(evento).values(nome=nome_evento, valor=valor_evento)
             )
             session.commit()
+        invalidar("evento")
 
         st.success(f"✅ Evento '{nome_evento}' criado com sucesso!")
 
 
+def inscrever_em_lote(session, evento_id, codigos_sgc):
+    """
+    Inscreve no evento, com status Pendente, os membros de `codigos_sgc` que
+    ainda não estão inscritos, em um único INSERT ... SELECT.
+    Retorna quantas inscrições foram criadas. A transação fica a cargo de quem chama.
+    """
+    membros = tables.get("membros")
+    inscricao_eventos = tables.get("inscricao_eventos")
+
+    novos = (
+        select(membros.c.codigo_sgc, literal(evento_id), literal("Pendente"))
+        .where(membros.c.codigo_sgc.in_(codigos_sgc))
+        .where(~exists().where(inscricao_eventos.c.id_evento == evento_id,
+                               inscricao_eventos.c.codigo_sgc == membros.c.codigo_sgc))
+    )
+    result = session.execute(
+        insert(inscricao_eventos).from_select(["codigo_sgc", "id_evento", "status"], novos)
+    )
+    return result.rowcount
+
+
 def inscrever_no_evento():
 
     if not engine:
@@ -119,14 +179,9 @@ def inscrever_no_evento():
     st.subheader("📌 Inscrever em Evento")
 
     # Buscar eventos disponíveis
-    with Session(engine) as session:
-        eventos_query = session.execute(evento.select()).fetchall()
-        membros_query = session.execute(
-            select(membros.c.codigo_sgc, membros.c.nome)  # ✅ Seleciona apenas as colunas necessárias
-        ).fetchall()
-
-    eventos_df = pd.DataFrame(eventos_query, columns=["id", "valor", "nome"])
-    membros_df = pd.DataFrame(membros_query, columns=["codigo_sgc", "nome"])
+    eventos_df = referencia("evento")
+    membros_df = referencia("membros")[["codigo_sgc", "nome", "cargo", "id_unidade"]]
+    unidades_df = referencia("unidades")
 
     if eventos_df.empty:
         st.warning("⚠️ Nenhum evento encontrado. Cadastre um evento antes de inscrever participantes.")
@@ -143,25 +198,45 @@ def inscrever_no_evento():
     # Criar coluna formatada para exibir "Código SGC - Nome"
     membros_df["display"] = membros_df["codigo_sgc"].astype(str) + " - " + membros_df["nome"]
 
-    # Selecionar o membro no formato desejado
-    membro_selecionado = st.selectbox("Selecione um Desbravador", membros_df["display"], key="select_membro")
+    # 🔹 Atalhos: adicionam à seleção uma unidade inteira ou todos de um cargo
+    def adicionar(mascara):
+        atuais = st.session_state.get("select_membros", [])
+        st.session_state["select_membros"] = atuais + [d for d in membros_df.loc[mascara, "display"] if d not in atuais]
+
+    col1, col2 = st.columns(2)
+    unidade_atalho = col1.selectbox("Unidade", unidades_df["nome"], key="atalho_unidade")
+    if not unidades_df.empty:
+        id_unidade = unidades_df.loc[unidades_df["nome"] == unidade_atalho, "id"].values[0]
+        col1.button("➕ Unidade inteira", key="atalho_unidade_btn",
+                    on_click=adicionar, args=(membros_df["id_unidade"] == id_unidade,))
+
+    cargo_atalho = col2.selectbox("Cargo", sorted(membros_df["cargo"].dropna().unique()), key="atalho_cargo")
+    col2.button("➕ Todos do cargo", key="atalho_cargo_btn",
+                on_click=adicionar, args=(membros_df["cargo"] == cargo_atalho,))
 
-    # Obter o código SGC real a partir da seleção
-    codigo_sgc = str(membros_df.loc[membros_df["display"] == membro_selecionado, "codigo_sgc"].values[0])
-    if st.button("💾 Inscrever"):
+    # Selecionar os membros no formato desejado
+    selecionados = st.multiselect("Selecione os Desbravadores", membros_df["display"], key="select_membros")
+
+    # Obter os códigos SGC reais a partir da seleção
+    codigos_sgc = [str(c) for c in membros_df.loc[membros_df["display"].isin(selecionados), "codigo_sgc"]]
+
+    if st.button(f"💾 Inscrever ({len(codigos_sgc)})", disabled=not codigos_sgc):
         with Session(engine) as session:
-            session.execute(
-                insert(inscricao_eventos).values(
-                    codigo_sgc=codigo_sgc,
-                    id_evento=int(evento_id),
-                    status="Pendente"
-                )
-            )
+            inscritos = inscrever_em_lote(session, int(evento_id), codigos_sgc)
             session.commit()
+        invalidar("inscricao_eventos")
 
-        st.success(f"✅ {membro_selecionado} foi inscrito no evento '{evento_selecionado}'!")
+        ja_inscritos = len(codigos_sgc) - inscritos
+        st.session_state["inscricao_resultado"] = (
+            f"✅ {inscritos} inscrições criadas no evento '{evento_selecionado}'"
+            + (f" ({ja_inscritos} já estavam inscritos)." if ja_inscritos else ".")
+        )
+        del st.session_state["select_membros"]
         st.rerun()
 
+    if "inscricao_resultado" in st.session_state:
+        st.success(st.session_state.pop("inscricao_resultado"))
+
 
 def editar_status_inscricao():
 
@@ -181,10 +256,7 @@ def editar_status_inscricao():
     st.subheader("✏️ Editar Status de Pagamento")
 
     # Buscar eventos existentes
-    with Session(engine) as session:
-        eventos_query = session.execute(evento.select()).fetchall()
-
-    eventos_df = pd.DataFrame(eventos_query, columns=["id", "valor", "nome"])
+    eventos_df = referencia("evento")
 
     if eventos_df.empty:
         st.warning("⚠️ Nenhum evento encontrado.")
@@ -202,6 +274,14 @@ def editar_status_inscricao():
     valor_evento = float(eventos_df.loc[eventos_df["id"] == evento_id, "valor"].values[0])
     st.write(f"💰 **Valor do Evento:** R$ {valor_evento:.2f}")
 
+    resumo = resumo_eventos().set_index("id")
+    if evento_id in resumo.index:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Inscritos", int(resumo.at[evento_id, "Inscritos"]))
+        col2.metric("Pagos", int(resumo.at[evento_id, "Pagos"]))
+        col3.metric("Pendentes", int(resumo.at[evento_id, "Pendentes"]))
+        col4.metric("Resultado", f"R$ {resumo.at[evento_id, 'Resultado']:.2f}")
+
     # Buscar inscritos no evento
     with Session(engine) as session:
         inscritos_query = session.execute(
@@ -236,8 +316,8 @@ def editar_status_inscricao():
     # Criar selectbox para editar status
     novo_status = st.selectbox(
         "Status:",
-        ["Pendente", "Pago", "Cancelado"],
-        index=["Pendente", "Pago", "Cancelado"].index(status_atual),
+        ["Pendente", "Pago", "Isento", "Cancelado"],
+        index=["Pendente", "Pago", "Isento", "Cancelado"].index(status_atual),
         key=f"status_{codigo_sgc}_{evento_id}"
     )
 
@@ -270,7 +350,10 @@ def editar_status_inscricao():
                         )
                     )
 
+                    recalcular_fechamentos(session, [periodo_da_data(data_hoje)])
+
                 session.commit()
+                invalidar("inscricao_eventos", "caixa", "fechamento")
 
         st.success(f"✅ Status atualizado com sucesso para {inscrito_selecionado}!")
         st.rerun()
@@ -293,10 +376,7 @@ def remover_inscricao():
     st.subheader("🗑️ Remover Inscrição")
 
     # Buscar eventos disponíveis
-    with Session(engine) as session:
-        eventos_query = session.execute(select(evento.c.id, evento.c.nome)).fetchall()
-
-    eventos_df = pd.DataFrame(eventos_query, columns=["id", "nome"])
+    eventos_df = referencia("evento")[["id", "nome"]]
 
     if eventos_df.empty:
         st.warning("⚠️ Nenhum evento encontrado.")
@@ -334,129 +414,217 @@ def remover_inscricao():
                 )
             )
             session.commit()
+        invalidar("inscricao_eventos")
 
         st.warning(f"⚠️ {inscrito_selecionado} foi removido do evento '{evento_selecionado}'.")
         st.rerun()
 
 
-def visualizar_relatorios():
+# **Tabelas lidas pelo resumo financeiro dos eventos (chave de versão do cache)**
+TABELAS_EVENTOS = ("evento", "inscricao_eventos", "caixa")
 
-    if not engine:
-        st.error("❌ Erro ao conectar ao banco de dados.")
-        return
 
-    fechamento = tables.get("fechamento")
+@st.cache_data(ttl=TTL_REFERENCIAS, show_spinner=False, max_entries=20)
+def _consultar_resumo_eventos(versao):
+    evento = tables.get("evento")
+    inscricao_eventos = tables.get("inscricao_eventos")
+    caixa = tables.get("caixa")
+
+    def contar(status):
+        return func.count().filter(inscricao_eventos.c.status == status)
+
+    # Cada lado é agregado por evento antes do join, para não multiplicar linhas
+    inscricoes = (
+        select(inscricao_eventos.c.id_evento, func.count().label("inscritos"),
+               contar("Pago").label("pagos"), contar("Pendente").label("pendentes"),
+               contar("Isento").label("isentos"), contar("Cancelado").label("cancelados"))
+        .group_by(inscricao_eventos.c.id_evento)
+        .subquery("inscricoes")
+    )
+    movimento = (
+        select(caixa.c.id_evento,
+               func.sum(caixa.c.valor).filter(caixa.c.tipo == "Entrada").label("entradas"),
+               func.sum(caixa.c.valor).filter(caixa.c.tipo == "Saída").label("saidas"))
+        .where(caixa.c.id_evento.isnot(None))
+        .group_by(caixa.c.id_evento)
+        .subquery("movimento")
+    )
+
+    pagos = func.coalesce(inscricoes.c.pagos, 0)
+    pendentes = func.coalesce(inscricoes.c.pendentes, 0)
+    entradas = func.coalesce(movimento.c.entradas, 0)
+    saidas = func.coalesce(movimento.c.saidas, 0)
+
+    with Session(engine) as session:
+        result = session.execute(
+            select(
+                evento.c.id,
+                evento.c.nome.label("Evento"),
+                evento.c.valor.label("Valor"),
+                func.coalesce(inscricoes.c.inscritos, 0).label("Inscritos"),
+                pagos.label("Pagos"),
+                pendentes.label("Pendentes"),
+                func.coalesce(inscricoes.c.isentos, 0).label("Isentos"),
+                func.coalesce(inscricoes.c.cancelados, 0).label("Cancelados"),
+                (evento.c.valor * (pagos + pendentes)).label("Receita Esperada"),
+                (evento.c.valor * pendentes).label("A Receber"),
+                entradas.label("Entradas"),
+                saidas.label("Saídas"),
+                (entradas - saidas).label("Resultado"),
+            )
+            .outerjoin(inscricoes, inscricoes.c.id_evento == evento.c.id)
+            .outerjoin(movimento, movimento.c.id_evento == evento.c.id)
+            .order_by(evento.c.nome)
+        )
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    valores = ["Valor", "Receita Esperada", "A Receber", "Entradas", "Saídas", "Resultado"]
+    df[valores] = df[valores].astype(float)
+    return df
+
+
+def resumo_eventos():
+    """
+    Resumo financeiro de todos os eventos de uma vez: inscritos por status,
+    receita esperada e a receber, entradas e saídas do caixa e o resultado.
+    Uma única consulta agrupada, em cache até a próxima escrita em evento,
+    inscricao_eventos ou caixa.
+    """
+    return _consultar_resumo_eventos(versao_dados(*TABELAS_EVENTOS))
+
+
+# **Tabelas lidas pelo painel de relatórios financeiros (chave de versão do cache)**
+TABELAS_RELATORIOS = ("fechamento", "caixa", "evento", "user_mensalidades", "mensalidades")
+
+
+@st.cache_data(ttl=TTL_REFERENCIAS, show_spinner=False, max_entries=20)
+def _consultar_relatorios(versao):
     caixa = tables.get("caixa")
     evento = tables.get("evento")
     user_mensalidades = tables.get("user_mensalidades")
     mensalidades = tables.get("mensalidades")
 
-    if fechamento is None or caixa is None or evento is None or user_mensalidades is None or mensalidades is None:
+    def movimento_eventos(session):
+        return session.execute(
+            select(evento.c.id, evento.c.nome, caixa.c.data, caixa.c.tipo, caixa.c.descricao, caixa.c.valor)
+            .join(caixa, evento.c.id == caixa.c.id_evento)
+            .order_by(evento.c.nome, caixa.c.data.desc())
+        ).fetchall()
+
+    def indicadores(session):
+        return session.execute(
+            select(
+                user_mensalidades.c.status,
+                func.count().label("total_mensalidades"),
+                func.count(user_mensalidades.c.codigo_sgc.distinct()).label("total_usuarios")
+            )
+            .group_by(user_mensalidades.c.status)
+        ).fetchall()
+
+    def periodos_mensalidades(session):
+        return session.execute(
+            select(mensalidades.c.ano, mensalidades.c.mes).distinct()
+            .order_by(mensalidades.c.ano.desc(), mensalidades.c.mes)
+        ).fetchall()
+
+    # Consultas independentes: cada uma em sua conexão, ao mesmo tempo
+    dados = consultar_em_paralelo({
+        "livro": livro_caixa,
+        "saldo": saldo_atual,
+        "eventos": movimento_eventos,
+        "indicadores": indicadores,
+        "periodos": periodos_mensalidades,
+    })
+
+    df_mes = pd.DataFrame(
+        dados["livro"],
+        columns=["Ano", "Mês", "Total Entradas", "Total Saídas", "Saldo do Mês", "Saldo Acumulado"]
+    )
+    return {
+        "mes": df_mes,
+        "ano": (df_mes.groupby("Ano", as_index=False)[["Total Entradas", "Total Saídas"]].sum()
+                .sort_values("Ano", ascending=False)),
+        "saldo": dados["saldo"],
+        "eventos": pd.DataFrame(dados["eventos"], columns=["id", "nome", "Data", "Tipo", "Descrição", "Valor"]),
+        "indicadores": pd.DataFrame(dados["indicadores"],
+                                    columns=["Status", "Total Mensalidades", "Total Usuários"]),
+        "periodos": pd.DataFrame(dados["periodos"], columns=["Ano", "Mês"]),
+    }
+
+
+def dados_relatorios():
+    """
+    Dados do painel financeiro, carregados com as consultas em paralelo e
+    compartilhados entre as sessões até a próxima escrita nas tabelas
+    envolvidas (ou até o TTL expirar).
+    """
+    return _consultar_relatorios(versao_dados(*TABELAS_RELATORIOS))
+
+
+def visualizar_relatorios():
+
+    if not engine:
+        st.error("❌ Erro ao conectar ao banco de dados.")
+        return
+
+    if any(tables.get(nome) is None for nome in TABELAS_RELATORIOS + TABELAS_EVENTOS):
         st.error("❌ Algumas tabelas não foram encontradas no banco de dados.")
         return
 
     st.subheader("📊 Relatórios Financeiros")
 
+    relatorios = dados_relatorios()
+
     # 🔹 Visão Geral por Ano
-    with Session(engine) as session:
-        df_ano = pd.DataFrame(
-            session.execute(
-                select(
-                    fechamento.c.ano,
-                    func.sum(fechamento.c.entrada).label("total_entradas"),
-                    func.sum(fechamento.c.saida).label("total_saidas")
-                )
-                .group_by(fechamento.c.ano)
-                .order_by(fechamento.c.ano.desc())
-            ).fetchall(),
-            columns=["Ano", "Total Entradas", "Total Saídas"]
-        )
+    df_ano = relatorios["ano"]
 
     st.subheader("📆 Visão Geral por Ano")
     if df_ano.empty:
         st.info("📌 Nenhum dado encontrado.")
     else:
-        st.dataframe(df_ano)
+        st.dataframe(df_ano, hide_index=True)
 
-    # 🔹 Visão Geral por Mês
-    with Session(engine) as session:
-        df_mes = pd.DataFrame(
-            session.execute(
-                select(
-                    fechamento.c.ano,
-                    fechamento.c.mes,
-                    fechamento.c.entrada.label("total_entradas"),
-                    fechamento.c.saida.label("total_saidas")
-                )
-                .order_by(fechamento.c.ano.desc(), fechamento.c.mes.desc())
-            ).fetchall(),
-            columns=["Ano", "Mês", "Total Entradas", "Total Saídas"]
-        )
+    # 🔹 Visão Geral por Mês, com o saldo acumulado do livro caixa
+    df_mes = relatorios["mes"]
 
     if not df_mes.empty:
-        df_mes["Mês/Ano"] = df_mes["Mês"].astype(str) + "/" + df_mes["Ano"].astype(str)
-        df_mes = df_mes[["Mês/Ano", "Total Entradas", "Total Saídas"]]
+        df_mes = df_mes.assign(**{"Mês/Ano": df_mes["Mês"].astype(str) + "/" + df_mes["Ano"].astype(str)})
+        df_mes = df_mes[["Mês/Ano", "Total Entradas", "Total Saídas", "Saldo do Mês", "Saldo Acumulado"]].iloc[::-1]
 
     st.subheader("📅 Visão Geral por Mês")
     if df_mes.empty:
         st.info("📌 Nenhum dado encontrado.")
     else:
-        st.dataframe(df_mes)
+        st.dataframe(df_mes, hide_index=True)
 
     # 🔹 Relatório por Evento
     st.subheader("🎯 Relatório por Evento")
 
-    with Session(engine) as session:
-        eventos_query = session.execute(
-            select(evento.c.id, evento.c.nome)
-            .distinct()
-            .join(caixa, evento.c.id == caixa.c.id_evento)
-        ).fetchall()
-
-    eventos_df = pd.DataFrame(eventos_query, columns=["id", "nome"])
+    df_resumo = resumo_eventos()
+    if not df_resumo.empty:
+        st.dataframe(df_resumo.drop(columns=["id"]), hide_index=True)
 
-    if not eventos_df.empty:
-        evento_dict = {row["nome"]: row["id"] for _, row in eventos_df.iterrows()}
-        evento_selecionado = st.selectbox("Selecione um Evento", list(evento_dict.keys()))
-        evento_id = evento_dict[evento_selecionado]
+    df_eventos = relatorios["eventos"]
 
-        with Session(engine) as session:
-            df_evento = pd.DataFrame(
-                session.execute(
-                    select(caixa.c.data, caixa.c.tipo, caixa.c.descricao, caixa.c.valor)
-                    .where(caixa.c.id_evento == evento_id)
-                    .order_by(caixa.c.data.desc())
-                ).fetchall(),
-                columns=["Data", "Tipo", "Descrição", "Valor"]
-            )
+    if not df_eventos.empty:
+        evento_selecionado = st.selectbox("Selecione um Evento", df_eventos["nome"].unique())
+        df_evento = df_eventos.loc[df_eventos["nome"] == evento_selecionado, ["Data", "Tipo", "Descrição", "Valor"]]
 
-        if not df_evento.empty:
-            total_entradas = df_evento[df_evento["Tipo"] == "Entrada"]["Valor"].sum()
-            total_saidas = df_evento[df_evento["Tipo"] == "Saída"]["Valor"].sum()
-            saldo_evento = total_entradas - total_saidas
+        total_entradas = df_evento[df_evento["Tipo"] == "Entrada"]["Valor"].sum()
+        total_saidas = df_evento[df_evento["Tipo"] == "Saída"]["Valor"].sum()
+        saldo_evento = total_entradas - total_saidas
 
-            st.write(f"📥 **Total Entradas:** R$ {total_entradas:.2f}")
-            st.write(f"📤 **Total Saídas:** R$ {total_saidas:.2f}")
-            st.write(f"💰 **Saldo do Evento:** R$ {saldo_evento:.2f}")
-            st.dataframe(df_evento)
-        else:
-            st.info("📌 Nenhuma movimentação registrada para este evento.")
+        st.write(f"📥 **Total Entradas:** R$ {total_entradas:.2f}")
+        st.write(f"📤 **Total Saídas:** R$ {total_saidas:.2f}")
+        st.write(f"💰 **Saldo do Evento:** R$ {saldo_evento:.2f}")
+        st.dataframe(df_evento, hide_index=True)
 
     else:
         st.warning("⚠️ Nenhum evento com movimentação financeira encontrado.")
 
     # 🔹 Cálculo do Caixa e Custos
     st.subheader("💰 Cálculo do Caixa e Custos")
-    with Session(engine) as session:
-        df_total = session.execute(
-            select(
-                func.sum(fechamento.c.entrada).label("total_entradas"),
-                func.sum(fechamento.c.saida).label("total_saidas")
-            )
-        ).fetchone()
-
-    total_entradas = df_total.total_entradas or 0
-    total_saidas = df_total.total_saidas or 0
+    total_entradas, total_saidas = relatorios["saldo"]
     saldo_final = total_entradas - total_saidas
 
     st.write(f"📥 **Total de Entradas:** R$ {total_entradas:.2f}")
@@ -466,18 +634,7 @@ def visualizar_relatorios():
     # 🔹 Indicadores de Mensalidades
     st.subheader("📊 Indicadores de Mensalidades")
 
-    with Session(engine) as session:
-        df_mensalidades = pd.DataFrame(
-            session.execute(
-                select(
-                    user_mensalidades.c.status,
-                    func.count().label("total_mensalidades"),
-                    func.count(user_mensalidades.c.codigo_sgc.distinct()).label("total_usuarios")
-                )
-                .group_by(user_mensalidades.c.status)
-            ).fetchall(),
-            columns=["Status", "Total Mensalidades", "Total Usuários"]
-        )
+    df_mensalidades = relatorios["indicadores"]
 
     if not df_mensalidades.empty:
         for status in ["Pago", "Pendente", "Isento"]:
@@ -490,22 +647,11 @@ def visualizar_relatorios():
     # 🔹 Mensalidades Detalhadas por Mês/Ano
     st.subheader("📊 Mensalidades Detalhadas")
 
-    with Session(engine) as session:
-        anos_query = session.execute(select(mensalidades.c.ano.distinct()).order_by(mensalidades.c.ano.desc())).fetchall()
-
-    anos_df = pd.DataFrame(anos_query, columns=["Ano"])
+    periodos_df = relatorios["periodos"]
 
-    if not anos_df.empty:
-        ano_selecionado = st.selectbox("Selecione o Ano", anos_df["Ano"])
-
-        with Session(engine) as session:
-            meses_query = session.execute(
-                select(mensalidades.c.mes.distinct())
-                .where(mensalidades.c.ano == ano_selecionado)
-                .order_by(mensalidades.c.mes.asc())
-            ).fetchall()
-
-        meses_df = pd.DataFrame(meses_query, columns=["Mês"])
+    if not periodos_df.empty:
+        ano_selecionado = st.selectbox("Selecione o Ano", periodos_df["Ano"].unique())
+        meses_df = periodos_df[periodos_df["Ano"] == ano_selecionado]
 
         if not meses_df.empty:
             mes_selecionado = st.selectbox("Selecione o Mês", meses_df["Mês"])
@@ -590,26 +736,33 @@ def editar_status_mensalidade():
     if col1.button("💾 Atualizar Status", key="atualizar_status"):
         with Session(engine) as session:
             try:
-                for id_mensalidade, (status_atual, novo_status, valor) in novos_status.items():
-                    if status_atual != novo_status:
-                        session.execute(
-                            update(user_mensalidades)
-                            .where(user_mensalidades.c.id_mensalidade == id_mensalidade,
-                                   user_mensalidades.c.codigo_sgc == codigo_sgc)
-                            .values(status=novo_status)
-                        )
-
-                        if novo_status == "Pago" and status_atual != "Pago":
-                            session.execute(
-                                insert(caixa).values(
-                                    tipo="Entrada",
-                                    descricao=f"Mensalidade - {codigo_sgc}",
-                                    valor=valor,
-                                    data=pd.Timestamp.today().strftime("%Y-%m-%d")
-                                )
-                            )
+                alteracoes = [
+                    {"b_id": int(id_mensalidade), "b_sgc": codigo_sgc, "b_status": novo_status}
+                    for id_mensalidade, (status_atual, novo_status, valor) in novos_status.items()
+                    if status_atual != novo_status
+                ]
+                lancamentos = [
+                    {"tipo": "Entrada", "descricao": f"Mensalidade - {codigo_sgc}", "valor": valor,
+                     "data": pd.Timestamp.today().strftime("%Y-%m-%d")}
+                    for status_atual, novo_status, valor in novos_status.values()
+                    if novo_status == "Pago" and status_atual != "Pago"
+                ]
+
+                # Uma execução em lote para os status e outra para os lançamentos no caixa
+                if alteracoes:
+                    session.execute(
+                        update(user_mensalidades)
+                        .where(user_mensalidades.c.id_mensalidade == bindparam("b_id"),
+                               user_mensalidades.c.codigo_sgc == bindparam("b_sgc"))
+                        .values(status=bindparam("b_status")),
+                        alteracoes
+                    )
+                if lancamentos:
+                    session.execute(insert(caixa), lancamentos)
+                    recalcular_fechamentos(session, [periodo_da_data(pd.Timestamp.today())])
 
                 session.commit()
+                invalidar("user_mensalidades", "caixa", "fechamento")
                 st.success("✅ Status atualizado com sucesso!")
                 st.rerun()
             except Exception as e:
@@ -622,83 +775,354 @@ def editar_status_mensalidade():
         st.rerun()
 
 
+# **Tabelas lidas pelo relatório de débitos (chave de versão do cache)**
+TABELAS_DEBITOS = ("membros", "unidades", "mensalidades", "user_mensalidades", "evento", "inscricao_eventos")
+
+# **Faixas de atraso das mensalidades pendentes, em meses: (rótulo, mínimo, máximo)**
+FAIXAS_ATRASO = [
+    ("A vencer", None, -1),
+    ("Até 1 mês", 0, 1),
+    ("2 a 3 meses", 2, 3),
+    ("4 a 6 meses", 4, 6),
+    ("Mais de 6 meses", 7, None),
+]
+
+
+@st.cache_data(ttl=TTL_REFERENCIAS, show_spinner=False, max_entries=20)
+def _consultar_debitos(periodo_atual, versao):
+    membros = tables.get("membros")
+    unidades = tables.get("unidades")
+    mensalidades = tables.get("mensalidades")
+    user_mensalidades = tables.get("user_mensalidades")
+    eventos = tables.get("evento")
+    inscricao_eventos = tables.get("inscricao_eventos")
+
+    # Cada cobrança pendente vira um item; o atraso é contado em meses até o período atual
+    itens = union_all(
+        select(
+            user_mensalidades.c.codigo_sgc,
+            literal("Mensalidade").label("tipo"),
+            func.concat(func.lpad(cast(mensalidades.c.mes, String), 2, "0"), "/", mensalidades.c.ano).label("descricao"),
+            mensalidades.c.valor.label("valor"),
+            (literal(periodo_atual) - (mensalidades.c.ano * 12 + mensalidades.c.mes)).label("atraso"),
+        )
+        .join(mensalidades, user_mensalidades.c.id_mensalidade == mensalidades.c.id)
+        .where(user_mensalidades.c.status == "Pendente"),
+        select(
+            inscricao_eventos.c.codigo_sgc,
+            literal("Evento"),
+            eventos.c.nome,
+            eventos.c.valor,
+            cast(null(), Integer),
+        )
+        .join(eventos, eventos.c.id == inscricao_eventos.c.id_evento)
+        .where(inscricao_eventos.c.status == "Pendente"),
+    ).cte("itens")
+
+    def soma(*condicoes):
+        return func.coalesce(func.sum(itens.c.valor).filter(*condicoes), 0)
+
+    faixas = []
+    for rotulo, minimo, maximo in FAIXAS_ATRASO:
+        condicoes = [itens.c.tipo == "Mensalidade"]
+        if minimo is not None:
+            condicoes.append(itens.c.atraso >= minimo)
+        if maximo is not None:
+            condicoes.append(itens.c.atraso <= maximo)
+        faixas.append(soma(*condicoes).label(rotulo))
+
+    total = soma().label("Total")
+
+    stmt = (
+        select(
+            membros.c.codigo_sgc.label("Código SGC"),
+            membros.c.nome.label("Nome"),
+            unidades.c.nome.label("Unidade"),
+            func.count().filter(itens.c.tipo == "Mensalidade").label("Mensalidades"),
+            soma(itens.c.tipo == "Mensalidade").label("Valor Mensalidades"),
+            func.count().filter(itens.c.tipo == "Evento").label("Eventos"),
+            soma(itens.c.tipo == "Evento").label("Valor Eventos"),
+            total,
+            *faixas,
+            func.coalesce(func.max(itens.c.atraso), 0).label("Atraso máximo"),
+            func.json_agg(func.json_build_object(
+                "tipo", itens.c.tipo, "descricao", itens.c.descricao,
+                "valor", itens.c.valor, "atraso", itens.c.atraso,
+            )).label("itens"),
+        )
+        .select_from(itens)
+        .join(membros, membros.c.codigo_sgc == itens.c.codigo_sgc)
+        .outerjoin(unidades, unidades.c.id == membros.c.id_unidade)
+        .group_by(membros.c.codigo_sgc, membros.c.nome, unidades.c.nome)
+        .order_by(total.desc())
+    )
+
+    with Session(engine) as session:
+        result = session.execute(stmt)
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    valores = ["Valor Mensalidades", "Valor Eventos", "Total"] + [rotulo for rotulo, _, _ in FAIXAS_ATRASO]
+    df[valores] = df[valores].astype(float)
+    df["Unidade"] = df["Unidade"].fillna("Sem unidade")
+    return df
+
+
+def debitos_do_clube():
+    """
+    Débitos pendentes (mensalidades e eventos) somados por membro, com as
+    mensalidades separadas por faixa de atraso e os itens de cada membro na
+    coluna `itens`.
+
+    Calculado em uma única consulta agrupada e compartilhado entre as sessões
+    até a próxima escrita nas tabelas envolvidas (ou até o TTL expirar).
+    """
+    hoje = datetime.now()
+    return _consultar_debitos(hoje.year * 12 + hoje.month, versao_dados(*TABELAS_DEBITOS))
+
+
 def visualizar_debitos():
 
+    if not engine:
+        st.error("❌ Erro ao conectar ao banco de dados.")
+        return
+
+    if any(tables.get(nome) is None for nome in TABELAS_DEBITOS):
+        st.error("❌ Algumas tabelas necessárias não foram encontradas no banco de dados.")
+        return
+
+    st.subheader("💰 Débitos dos Desbravadores")
+
+    df_debitos = debitos_do_clube()
+
+    if df_debitos.empty:
+        st.success("🎉 Nenhum desbravador tem débitos pendentes!")
+        return
+
+    # 🔹 Filtro por unidade e ordenação
+    col1, col2 = st.columns(2)
+    unidade = col1.selectbox("Unidade", ["Todas"] + sorted(df_debitos["Unidade"].unique()), key="debitos_unidade")
+    ordem = col2.selectbox("Ordenar por", ["Total", "Atraso máximo", "Nome"], key="debitos_ordem")
+
+    if unidade != "Todas":
+        df_debitos = df_debitos[df_debitos["Unidade"] == unidade]
+    df_debitos = df_debitos.sort_values(ordem, ascending=(ordem == "Nome"))
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Devedores", len(df_debitos))
+    col2.metric("Total em Aberto", f"R$ {df_debitos['Total'].sum():.2f}")
+    vencidas = [rotulo for rotulo, minimo, _ in FAIXAS_ATRASO if minimo is not None]
+    col3.metric("Mensalidades Vencidas", f"R$ {df_debitos[vencidas].to_numpy().sum():.2f}")
+
+    st.dataframe(df_debitos.drop(columns=["itens"]), hide_index=True)
+
+    # 🔹 Detalhamento de um membro, a partir do resultado já calculado
+    membro_dict = {f"{row['Nome']} ({row['Código SGC']})": indice for indice, row in df_debitos.iterrows()}
+    membro_selecionado = st.selectbox("Detalhar Desbravador", list(membro_dict.keys()), key="debitos_membro")
+
+    membro = df_debitos.loc[membro_dict[membro_selecionado]]
+    df_itens = pd.DataFrame(membro["itens"])
+
+    df_mensalidades = df_itens[df_itens["tipo"] == "Mensalidade"]
+    df_eventos = df_itens[df_itens["tipo"] == "Evento"]
+
+    # Exibir os dados
+    st.write(f"**📌 Mensalidades Pendentes: {len(df_mensalidades)}**")
+    if not df_mensalidades.empty:
+        st.dataframe(
+            df_mensalidades[["descricao", "valor", "atraso"]]
+            .rename(columns={"descricao": "Mês", "valor": "Valor", "atraso": "Meses de atraso"}),
+            hide_index=True
+        )
+
+    st.write(f"**📌 Eventos Inscritos e Não Pagos: {len(df_eventos)}**")
+    if not df_eventos.empty:
+        st.dataframe(df_eventos[["descricao", "valor"]].rename(columns={"descricao": "Evento", "valor": "Valor"}),
+                     hide_index=True)
+
+    # Exibir valor total dos débitos
+    st.write(f"### 💰 **Total de Débitos: R$ {membro['Total']:.2f}**")
+
+
+def registrar_pagamentos(session, mensalidades_sel, inscricoes_sel, status):
+    """
+    Aplica `status` ("Pago" ou "Isento") a várias cobranças de uma vez.
+
+    `mensalidades_sel` traz pares (id_mensalidade, codigo_sgc) e `inscricoes_sel`
+    pares (id_evento, codigo_sgc). Só cobranças ainda pendentes são alteradas:
+    elas são travadas e relidas em uma consulta por tabela, atualizadas com um
+    único executemany e, quando pagas, lançadas no caixa em um insert em lote.
+    A transação fica a cargo de quem chama. Retorna (mensalidades, inscrições,
+    valor lançado no caixa).
+    """
+    user_mensalidades = tables.get("user_mensalidades")
+    mensalidades = tables.get("mensalidades")
+    inscricao_eventos = tables.get("inscricao_eventos")
+    eventos = tables.get("evento")
+    caixa = tables.get("caixa")
+
+    data_hoje = pd.Timestamp.today().strftime("%Y-%m-%d")
+    lancamentos = []
+
+    pendentes_mensalidades = []
+    if mensalidades_sel:
+        pendentes_mensalidades = session.execute(
+            select(user_mensalidades.c.id_mensalidade, user_mensalidades.c.codigo_sgc, mensalidades.c.valor)
+            .join(mensalidades, user_mensalidades.c.id_mensalidade == mensalidades.c.id)
+            .where(tuple_(user_mensalidades.c.id_mensalidade, user_mensalidades.c.codigo_sgc).in_(mensalidades_sel))
+            .where(user_mensalidades.c.status == "Pendente")
+            .with_for_update(of=user_mensalidades)
+        ).fetchall()
+
+    if pendentes_mensalidades:
+        session.execute(
+            update(user_mensalidades)
+            .where(user_mensalidades.c.id_mensalidade == bindparam("b_id"),
+                   user_mensalidades.c.codigo_sgc == bindparam("b_sgc"))
+            .values(status=status),
+            [{"b_id": id_mensalidade, "b_sgc": codigo_sgc} for id_mensalidade, codigo_sgc, _ in pendentes_mensalidades]
+        )
+        if status == "Pago":
+            lancamentos += [
+                {"tipo": "Entrada", "descricao": f"Mensalidade - {codigo_sgc}", "valor": valor,
+                 "data": data_hoje, "id_evento": None}
+                for _, codigo_sgc, valor in pendentes_mensalidades
+            ]
+
+    pendentes_inscricoes = []
+    if inscricoes_sel:
+        pendentes_inscricoes = session.execute(
+            select(inscricao_eventos.c.id_evento, inscricao_eventos.c.codigo_sgc, eventos.c.nome, eventos.c.valor)
+            .join(eventos, eventos.c.id == inscricao_eventos.c.id_evento)
+            .where(tuple_(inscricao_eventos.c.id_evento, inscricao_eventos.c.codigo_sgc).in_(inscricoes_sel))
+            .where(inscricao_eventos.c.status == "Pendente")
+            .with_for_update(of=inscricao_eventos)
+        ).fetchall()
+
+    if pendentes_inscricoes:
+        session.execute(
+            update(inscricao_eventos)
+            .where(inscricao_eventos.c.id_evento == bindparam("b_id"),
+                   inscricao_eventos.c.codigo_sgc == bindparam("b_sgc"))
+            .values(status=status),
+            [{"b_id": id_evento, "b_sgc": codigo_sgc} for id_evento, codigo_sgc, _, _ in pendentes_inscricoes]
+        )
+        if status == "Pago":
+            lancamentos += [
+                {"tipo": "Entrada", "descricao": f"Evento {nome} - {codigo_sgc}", "valor": valor,
+                 "data": data_hoje, "id_evento": id_evento}
+                for id_evento, codigo_sgc, nome, valor in pendentes_inscricoes
+            ]
+
+    if lancamentos:
+        session.execute(insert(caixa), lancamentos)
+        recalcular_fechamentos(session, [periodo_da_data(data_hoje)])
+
+    return len(pendentes_mensalidades), len(pendentes_inscricoes), sum(l["valor"] for l in lancamentos)
+
+
+def pagamentos_em_lote():
+
     if not engine:
         st.error("❌ Erro ao conectar ao banco de dados.")
         return
 
     membros = tables.get("membros")
+    unidades = tables.get("unidades")
     user_mensalidades = tables.get("user_mensalidades")
     mensalidades = tables.get("mensalidades")
     inscricao_eventos = tables.get("inscricao_eventos")
     eventos = tables.get("evento")
+    caixa = tables.get("caixa")
 
-    if not membros or not user_mensalidades or not mensalidades or not inscricao_eventos or not eventos:
+    if any(t is None for t in (membros, unidades, user_mensalidades, mensalidades, inscricao_eventos, eventos, caixa)):
         st.error("❌ Algumas tabelas necessárias não foram encontradas no banco de dados.")
         return
 
-    st.subheader("💰 Débitos dos Desbravadores")
+    st.subheader("✅ Pagamentos em Lote")
+
+    # 🔹 Todas as cobranças pendentes do clube, em uma consulta
+    pendentes = union_all(
+        select(
+            literal("Mensalidade").label("tipo"),
+            user_mensalidades.c.id_mensalidade.label("id"),
+            user_mensalidades.c.codigo_sgc,
+            func.concat(func.lpad(cast(mensalidades.c.mes, String), 2, "0"), "/", mensalidades.c.ano).label("descricao"),
+            mensalidades.c.valor.label("valor"),
+        )
+        .join(mensalidades, user_mensalidades.c.id_mensalidade == mensalidades.c.id)
+        .where(user_mensalidades.c.status == "Pendente"),
+        select(literal("Evento"), inscricao_eventos.c.id_evento, inscricao_eventos.c.codigo_sgc,
+               eventos.c.nome, eventos.c.valor)
+        .join(eventos, eventos.c.id == inscricao_eventos.c.id_evento)
+        .where(inscricao_eventos.c.status == "Pendente"),
+    ).subquery()
 
-    # Buscar desbravadores que possuem mensalidades ou eventos pendentes
     with Session(engine) as session:
         result = session.execute(
-            select(membros.c.codigo_sgc, membros.c.nome)
-            .outerjoin(user_mensalidades,
-                       (user_mensalidades.c.codigo_sgc == membros.c.codigo_sgc) &
-                       (user_mensalidades.c.status == "Pendente"))
-            .outerjoin(inscricao_eventos,
-                       (inscricao_eventos.c.codigo_sgc == membros.c.codigo_sgc) &
-                       (inscricao_eventos.c.status == "Pendente"))
-            .distinct()
+            select(pendentes.c.tipo, pendentes.c.id, pendentes.c.codigo_sgc, membros.c.nome,
+                   unidades.c.nome, pendentes.c.descricao, pendentes.c.valor)
+            .join(membros, membros.c.codigo_sgc == pendentes.c.codigo_sgc)
+            .outerjoin(unidades, unidades.c.id == membros.c.id_unidade)
+            .order_by(membros.c.nome, pendentes.c.tipo, pendentes.c.id)
         ).fetchall()
 
     if not result:
-        st.success("🎉 Nenhum desbravador tem débitos pendentes!")
+        st.success("🎉 Nenhuma cobrança pendente!")
         return
 
-    df_membros = pd.DataFrame(result, columns=["codigo_sgc", "nome"])
-    membro_dict = {f"{row['nome']} ({row['codigo_sgc']})": row["codigo_sgc"] for _, row in df_membros.iterrows()}
-    membro_selecionado = st.selectbox("Selecione um Desbravador", list(membro_dict.keys()))
+    df_pendentes = pd.DataFrame(result, columns=["Tipo", "id", "Código SGC", "Nome", "Unidade", "Descrição", "Valor"])
+    df_pendentes["Valor"] = df_pendentes["Valor"].astype(float)
+    df_pendentes["Unidade"] = df_pendentes["Unidade"].fillna("Sem unidade")
 
-    codigo_sgc = membro_dict[membro_selecionado]
+    # 🔹 Filtros
+    col1, col2 = st.columns(2)
+    tipo = col1.selectbox("Tipo", ["Todos", "Mensalidade", "Evento"], key="lote_tipo")
+    unidade = col2.selectbox("Unidade", ["Todas"] + sorted(df_pendentes["Unidade"].unique()), key="lote_unidade")
 
-    # 🔹 Buscar mensalidades pendentes
-    with Session(engine) as session:
-        result_mensalidades = session.execute(
-            select(user_mensalidades.c.id_mensalidade, user_mensalidades.c.status,
-                   mensalidades.c.valor, mensalidades.c.mes, mensalidades.c.ano)
-            .join(mensalidades, user_mensalidades.c.id_mensalidade == mensalidades.c.id)
-            .where(user_mensalidades.c.codigo_sgc == codigo_sgc, user_mensalidades.c.status == "Pendente")
-        ).fetchall()
+    if tipo != "Todos":
+        df_pendentes = df_pendentes[df_pendentes["Tipo"] == tipo]
+    if unidade != "Todas":
+        df_pendentes = df_pendentes[df_pendentes["Unidade"] == unidade]
 
-    df_mensalidades = pd.DataFrame(result_mensalidades, columns=["id_mensalidade", "status", "valor", "mes", "ano"])
-    total_mensalidades = df_mensalidades["valor"].sum() if not df_mensalidades.empty else 0
+    if df_pendentes.empty:
+        st.info("📌 Nenhuma cobrança pendente com esses filtros.")
+        return
 
-    # 🔹 Buscar eventos inscritos e não pagos
-    with Session(engine) as session:
-        result_eventos = session.execute(
-            select(eventos.c.nome, eventos.c.valor)
-            .join(inscricao_eventos, eventos.c.id == inscricao_eventos.c.id_evento)
-            .where(inscricao_eventos.c.codigo_sgc == codigo_sgc, inscricao_eventos.c.status == "Pendente")
-        ).fetchall()
+    df_pendentes.insert(0, "Selecionar", st.checkbox("Selecionar todas", key="lote_todas"))
 
-    df_eventos = pd.DataFrame(result_eventos, columns=["nome", "valor"])
-    total_eventos = df_eventos["valor"].sum() if not df_eventos.empty else 0
+    editado = st.data_editor(
+        df_pendentes,
+        column_config={"id": None},
+        disabled=[coluna for coluna in df_pendentes.columns if coluna != "Selecionar"],
+        hide_index=True,
+        key=f"lote_editor_{tipo}_{unidade}"
+    )
+    selecionados = editado[editado["Selecionar"]]
 
-    total_debitos = total_mensalidades + total_eventos
+    status = st.radio("Marcar como", ["Pago", "Isento"], horizontal=True, key="lote_status")
+    st.write(f"**{len(selecionados)} cobranças selecionadas — R$ {selecionados['Valor'].sum():.2f}**")
 
-    # Exibir os dados
-    st.write(f"**📌 Mensalidades Pendentes: {len(df_mensalidades)}**")
-    if not df_mensalidades.empty:
-        st.dataframe(df_mensalidades[["mes", "ano", "valor"]])
+    if st.button("💾 Aplicar", key="lote_aplicar", disabled=selecionados.empty):
+        mensalidades_sel = [(int(row["id"]), row["Código SGC"])
+                            for _, row in selecionados[selecionados["Tipo"] == "Mensalidade"].iterrows()]
+        inscricoes_sel = [(int(row["id"]), row["Código SGC"])
+                          for _, row in selecionados[selecionados["Tipo"] == "Evento"].iterrows()]
 
-    st.write(f"**📌 Eventos Inscritos e Não Pagos: {len(df_eventos)}**")
-    if not df_eventos.empty:
-        st.dataframe(df_eventos)
+        with Session(engine) as session:
+            try:
+                n_mensalidades, n_inscricoes, total = registrar_pagamentos(
+                    session, mensalidades_sel, inscricoes_sel, status
+                )
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                st.error(f"❌ Erro ao registrar pagamentos: {e}")
+                return
 
-    # Exibir valor total dos débitos
-    st.write(f"### 💰 **Total de Débitos: R$ {total_debitos:.2f}**")
+        invalidar("user_mensalidades", "inscricao_eventos", "caixa", "fechamento")
+        st.success(f"✅ {n_mensalidades} mensalidades e {n_inscricoes} inscrições marcadas como {status}"
+                   + (f" — R$ {total:.2f} lançados no caixa." if status == "Pago" else "."))
+        st.rerun()
 
 
 def editar_evento():
@@ -719,14 +1143,12 @@ def editar_evento():
     st.subheader("✏️ Gerenciar Evento")
 
     # Buscar eventos existentes
-    with Session(engine) as session:
-        result = session.execute(select(evento.c.id, evento.c.nome, evento.c.valor)).fetchall()
+    df_eventos = referencia("evento")[["id", "nome", "valor"]]
 
-    if not result:
+    if df_eventos.empty:
         st.warning("⚠️ Nenhum evento encontrado para gerenciamento.")
         return
 
-    df_eventos = pd.DataFrame(result, columns=["id", "nome", "valor"])
     evento_dict = {row["nome"]: row["id"] for _, row in df_eventos.iterrows()}
     evento_selecionado = st.selectbox("Selecione o Evento", list(evento_dict.keys()), key="select_evento_gerenciar")
 
@@ -745,6 +1167,7 @@ def editar_evento():
             stmt = update(evento).where(evento.c.id == evento_id).values(nome=novo_nome, valor=novo_valor)
             session.execute(stmt)
             session.commit()
+        invalidar("evento")
 
         st.success(f"✅ Evento '{novo_nome}' atualizado com sucesso!")
         st.rerun()
@@ -766,6 +1189,7 @@ def editar_evento():
                     session.execute(delete(inscricao_eventos).where(inscricao_eventos.c.id_evento == evento_id))
                     session.execute(delete(evento).where(evento.c.id == evento_id))
                     session.commit()
+                    invalidar("evento")
                     st.warning(f"⚠️ Evento '{evento_selecionado}' e todas as inscrições foram removidos!")
                     st.rerun()
             except Exception as e:
@@ -814,6 +1238,7 @@ def editar_mensalidade():
             stmt = update(mensalidades).where(mensalidades.c.id == mensalidade_id).values(valor=novo_valor)
             session.execute(stmt)
             session.commit()
+        invalidar("mensalidades")
 
         st.success(f"✅ Mensalidade '{mensalidade_selecionada}' atualizada com sucesso!")
         st.rerun()
@@ -841,10 +1266,8 @@ def gerenciar_caixa():
     data = st.date_input("Data da Transação")
 
     # 🔹 Buscar eventos disponíveis para vinculação
-    with Session(engine) as session:
-        result = session.execute(select(evento.c.id, evento.c.nome)).mappings().all()
-
-    eventos_dict = {row["nome"]: row["id"] for row in result}
+    eventos_df = referencia("evento")
+    eventos_dict = {row["nome"]: int(row["id"]) for _, row in eventos_df.iterrows()}
     eventos_dict["Nenhum"] = None  # Opção para não vincular a um evento
     evento_selecionado = st.selectbox("Vincular a um Evento (Opcional)", list(eventos_dict.keys()))
     id_evento = eventos_dict[evento_selecionado]
@@ -860,24 +1283,54 @@ def gerenciar_caixa():
                 id_evento=id_evento
             )
             session.execute(stmt)
+            recalcular_fechamentos(session, [periodo_da_data(data)])
             session.commit()
+        invalidar("caixa", "fechamento")
 
         st.success("✅ Transação registrada com sucesso!")
         st.rerun()
 
-    # 🔹 Exibir registros
+    # 🔹 Transações registradas, filtradas no WHERE e paginadas por (data, id)
+    st.subheader("📊 Transações Registradas")
+
+    hoje = date.today()
+    col1, col2, col3 = st.columns(3)
+    periodo = col1.date_input("Período", value=(date(hoje.year, 1, 1), hoje), key="filtro_caixa_periodo")
+    tipo_filtro = col2.selectbox("Tipo", ["Todos", "Entrada", "Saída"], key="filtro_caixa_tipo")
+    evento_filtro = col3.selectbox("Evento", ["Todos", "Nenhum"] + eventos_df["nome"].tolist(), key="filtro_caixa_evento")
+
+    stmt = (
+        select(caixa.c.id, caixa.c.tipo, caixa.c.descricao, caixa.c.valor, caixa.c.data,
+               evento.c.nome.label("evento_relacionado"))
+        .outerjoin(evento, caixa.c.id_evento == evento.c.id)
+    )
+
+    if len(periodo) == 2:
+        stmt = stmt.where(caixa.c.data >= periodo[0], caixa.c.data < periodo[1] + timedelta(days=1))
+    if tipo_filtro != "Todos":
+        stmt = stmt.where(caixa.c.tipo == tipo_filtro)
+    if evento_filtro == "Nenhum":
+        stmt = stmt.where(caixa.c.id_evento.is_(None))
+    elif evento_filtro != "Todos":
+        stmt = stmt.where(caixa.c.id_evento == eventos_dict[evento_filtro])
+
+    filtros = (tuple(periodo), tipo_filtro, evento_filtro)
+    colunas = ["ID", "Tipo", "Descrição", "Valor", "Data", "Evento Relacionado"]
+
     with Session(engine) as session:
-        result = session.execute(
-            select(caixa.c.id, caixa.c.tipo, caixa.c.descricao, caixa.c.valor, caixa.c.data, evento.c.nome.label("evento_relacionado"))
-            .outerjoin(evento, caixa.c.id_evento == evento.c.id)
-            .order_by(caixa.c.data.desc())
-        ).fetchall()
+        total_estimado = estimar_linhas(session, stmt)
+        linhas, proximo = paginar(session, stmt, [caixa.c.data, caixa.c.id], "pagina_caixa", filtros)
 
-    if result:
-        st.subheader("📊 Transações Registradas")
-        df_caixa = pd.DataFrame(result, columns=["ID", "Tipo", "Descrição", "Valor", "Data", "Evento Relacionado"])
+    if linhas:
+        df_caixa = pd.DataFrame(linhas, columns=colunas)
         df_caixa.fillna("-", inplace=True)  # Substituir valores nulos por "-"
-        st.dataframe(df_caixa)
+        st.caption(f"≈ {total_estimado:,} transações encontradas".replace(",", "."))
+        st.dataframe(df_caixa, hide_index=True)
+        controles_paginacao("pagina_caixa", proximo)
+
+        # Exportação de todas as linhas do filtro, lidas em lotes
+        download_csv(stmt.order_by(caixa.c.data.desc(), caixa.c.id.desc()), colunas, "csv_caixa", filtros,
+                     "caixa.csv")
     else:
         st.info("📌 Nenhuma transação encontrada.")
 
@@ -897,6 +1350,14 @@ def fechamento_mensal():
 
     st.subheader("📌 Fechamento Mensal")
 
+    # 🔹 Fechar de uma vez todos os meses anteriores ainda abertos
+    if st.button("📚 Fechar Meses Pendentes", key="fechar_pendentes"):
+        with Session(engine) as session:
+            fechados = fechar_meses(session)
+            session.commit()
+        invalidar("fechamento")
+        st.success(f"✅ {fechados} meses fechados.")
+
     # 🔹 Selecionar o mês e ano
     mes = st.selectbox("Mês", list(range(1, 13)), index=0, format_func=lambda x: f"{x:02d}")
     ano = st.number_input("Ano", min_value=2000, max_value=2100, value=pd.Timestamp.today().year, step=1)
@@ -913,16 +1374,7 @@ def fechamento_mensal():
 
     # 🔹 Calcular entradas e saídas do mês
     with Session(engine) as session:
-        query = session.execute(
-            select(caixa.c.tipo, func.sum(caixa.c.valor).label("total"))
-            .where(func.to_char(caixa.c.data, 'MM') == f"{mes:02d}")  # Mês com dois dígitos
-            .where(func.to_char(caixa.c.data, 'YYYY') == str(ano))  # Ano como string
-            .group_by(caixa.c.tipo)
-        ).fetchall()
-
-    df_movimentacoes = pd.DataFrame(query, columns=["tipo", "total"])
-    entrada_total = df_movimentacoes.loc[df_movimentacoes["tipo"] == "Entrada", "total"].sum() if "Entrada" in df_movimentacoes["tipo"].values else 0
-    saida_total = df_movimentacoes.loc[df_movimentacoes["tipo"] == "Saída", "total"].sum() if "Saída" in df_movimentacoes["tipo"].values else 0
+        entrada_total, saida_total = movimento_do_mes(session, int(ano), int(mes))
 
     st.write(f"**📥 Total de Entradas:** R$ {entrada_total:.2f}")
     st.write(f"**📤 Total de Saídas:** R$ {saida_total:.2f}")
@@ -930,9 +1382,9 @@ def fechamento_mensal():
     # 🔹 Confirmar fechamento do mês
     if st.button("📌 Confirmar Fechamento"):
         with Session(engine) as session:
-            stmt = insert(fechamento).values(entrada=entrada_total, saida=saida_total, ano=ano, mes=mes)
-            session.execute(stmt)
+            fechar_mes(session, int(ano), int(mes))
             session.commit()
+        invalidar("fechamento")
 
         st.success("✅ Fechamento do mês registrado com sucesso!")
         st.rerun()
\ No newline at end of file
@@ -0,0 +1,12 @@
+-- Uma chamada por membro em cada reunião/unidade: base do upsert em pgs.chamadas.
+
+-- Remove duplicatas antigas, mantendo o registro mais recente
+DELETE FROM chamadas c
+USING chamadas d
+WHERE c.reuniao_id = d.reuniao_id
+  AND c.id_unidade = d.id_unidade
+  AND c.membro = d.membro
+  AND c.id < d.id;
+
+ALTER TABLE chamadas
+    ADD CONSTRAINT chamadas_reuniao_unidade_membro_key UNIQUE (reuniao_id, id_unidade, membro);
@@ -0,0 +1,26 @@
+-- Totais de pontuação por unidade e mês, mantidos por pgs.pontuacao.recalcular_resumo.
+
+CREATE TABLE IF NOT EXISTS pontuacao_resumo (
+    id_unidade   INTEGER NOT NULL REFERENCES unidades (id) ON DELETE CASCADE,
+    ano          INTEGER NOT NULL,
+    mes          INTEGER NOT NULL,
+    presenca     BIGINT  NOT NULL DEFAULT 0,
+    pontualidade BIGINT  NOT NULL DEFAULT 0,
+    uniforme     BIGINT  NOT NULL DEFAULT 0,
+    modestia     BIGINT  NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_unidade, ano, mes)
+);
+
+-- Carga inicial com todo o histórico
+INSERT INTO pontuacao_resumo (id_unidade, ano, mes, presenca, pontualidade, uniforme, modestia)
+SELECT c.id_unidade,
+       EXTRACT(YEAR FROM r.data)::INTEGER,
+       EXTRACT(MONTH FROM r.data)::INTEGER,
+       COALESCE(SUM(c.presenca), 0),
+       COALESCE(SUM(c.pontualidade), 0),
+       COALESCE(SUM(c.uniforme), 0),
+       COALESCE(SUM(c.modestia), 0)
+FROM chamadas c
+JOIN reunioes r ON r.id = c.reuniao_id
+GROUP BY 1, 2, 3
+ON CONFLICT (id_unidade, ano, mes) DO NOTHING;
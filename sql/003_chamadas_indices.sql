@@ -0,0 +1,5 @@
+-- Índices para os filtros e a paginação de visualizar_chamada.
+-- O filtro por reunião já usa a restrição única (reuniao_id, id_unidade, membro).
+
+CREATE INDEX IF NOT EXISTS chamadas_id_unidade_id_idx ON chamadas (id_unidade, id);
+CREATE INDEX IF NOT EXISTS reunioes_data_idx ON reunioes (data);
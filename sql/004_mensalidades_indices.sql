@@ -0,0 +1,4 @@
+-- Índices usados pela geração idempotente de mensalidades (pgs.tesouraria.gerar_mensalidades).
+
+CREATE INDEX IF NOT EXISTS mensalidades_ano_mes_idx ON mensalidades (ano, mes);
+CREATE INDEX IF NOT EXISTS user_mensalidades_mensalidade_sgc_idx ON user_mensalidades (id_mensalidade, codigo_sgc);
@@ -0,0 +1,14 @@
+-- Um fechamento por mês: base do livro caixa em pgs.livro_caixa.
+
+-- Remove fechamentos duplicados, mantendo o mais recente
+DELETE FROM fechamento f
+USING fechamento d
+WHERE f.ano = d.ano
+  AND f.mes = d.mes
+  AND f.ctid < d.ctid;
+
+ALTER TABLE fechamento
+    ADD CONSTRAINT fechamento_ano_mes_key UNIQUE (ano, mes);
+
+-- Totais por intervalo de datas (fechamento, saldo dos meses abertos)
+CREATE INDEX IF NOT EXISTS caixa_data_idx ON caixa (data);
@@ -0,0 +1,7 @@
+-- Índices da listagem paginada do caixa (pgs.tesouraria.gerenciar_caixa), ordenada por (data, id).
+
+CREATE INDEX IF NOT EXISTS caixa_data_id_idx ON caixa (data, id);
+CREATE INDEX IF NOT EXISTS caixa_evento_data_id_idx ON caixa (id_evento, data, id);
+
+-- Coberto por caixa_data_id_idx
+DROP INDEX IF EXISTS caixa_data_idx;
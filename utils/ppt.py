@@ -1,11 +1,14 @@
 import collections
 import collections.abc
+import copy
+import io
+import re
 from pptx import Presentation
-from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.package import XmlPart
+from pptx.oxml.ns import qn
 from pptx.util import Pt, Cm
-import aspose.slides as slides
 from PIL import Image
-import os
 import pandas as pd
 
 DEBUG = True
@@ -72,6 +75,85 @@ def replace_text(ppt, search_string, replace_string, how='all'):
     return ppt
 
 
+def index_placeholders(ppt, keys, how='all'):
+    """
+    Built to find every slot of the keys in one pass over the slides
+    Parameters
+    ----------
+    ppt : Presentation type
+        slides
+    keys : iterable of Text
+        keys we need to search
+    how : 'all' or int
+        if has a number just index the slide with this index
+
+    Returns
+    -------
+    dict key -> deque with the first run of each paragraph holding the key,
+    in the same order replace_text(..., how='first') would find them
+
+    """
+    assert (how == 'all' or type(how) == int)
+
+    keys = {str(key) for key in keys}
+    index = {key: collections.deque() for key in keys}
+
+    if type(how) == int:
+        slide_loop = [ppt.slides[how]]
+    else:
+        slide_loop = ppt.slides
+
+    for slide in slide_loop:
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                for para in shape.text_frame.paragraphs:
+                    if para.runs:
+                        run = para.runs[0]
+                        cur_text = run.text
+                        for key in keys:
+                            if key in cur_text:
+                                index[key].append(run)
+    return index
+
+
+def fill_placeholders(ppt, pairs, how='all'):
+    """
+    Same result as calling replace_text(ppt, key, value, how='first') for each
+    pair in order, but the slides are scanned only once: each key fills its
+    next free slot from index_placeholders. Keys without free slots left are
+    ignored, like in replace_text. The replaced values are not searched again.
+    Parameters
+    ----------
+    ppt : Presentation type
+        slides
+    pairs : iterable of (key, value)
+        keys and the data to put in their places, in order
+    how : 'all' or int
+        if has a number just replace on the slide with this index
+
+    Returns
+    -------
+    pptx with the data in the places of the keys
+
+    """
+    pairs = [(str(key), str(value)) for key, value in pairs]
+    index = index_placeholders(ppt, {key for key, _ in pairs}, how)
+
+    for key, value in pairs:
+        slots = index[key]
+        if not slots:
+            continue
+
+        run = slots.popleft()
+        cur_text = run.text
+
+        if DEBUG:
+            print(cur_text, '->', value)
+
+        run.text = cur_text.replace(key, value)
+    return ppt
+
+
 def delete_shape(slide, shape):
     '''
     Function
@@ -153,35 +235,166 @@ def replace_text_by_image(ppt, search_str, image_link, how='all', adjust_size=Fa
     return ppt
 
 
-def duplicate_slides(ppt1, ppt2='same', index=-1, n_copies=1):
-    if ppt2 == 'same' or ppt1 == ppt2:
-        ppt1.save('temp.pptx')
-        ppt1 = slides.Presentation('temp.pptx')
-        ppt2 = ppt1
+# Partes que pertencem à estrutura da apresentação: são compartilhadas, nunca copiadas
+STRUCTURAL_RELS = {RT.SLIDE, RT.SLIDE_LAYOUT, RT.SLIDE_MASTER, RT.NOTES_SLIDE, RT.NOTES_MASTER, RT.THEME}
+
+
+def _check_rels(part, same_deck, seen=None):
+    """
+    Raises ValueError if `part` (or a part it copies) points to the structure
+    of another deck, e.g. a hyperlink to one of its slides. Called before the
+    new slide is added, so a rejected copy leaves the presentation untouched.
+    """
+    seen = set() if seen is None else seen
+    seen.add(id(part))
+
+    for rel in part.rels.values():
+        if rel.is_external or rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+            continue
+        if rel.reltype in STRUCTURAL_RELS:
+            if not same_deck:
+                raise ValueError(f"Slide de outra apresentação aponta para a estrutura dela: {rel.reltype}")
+        elif rel.reltype != RT.IMAGE and id(rel.target_part) not in seen:
+            _check_rels(rel.target_part, same_deck, seen)
+
+
+def _copy_part(part, package, copies):
+    """
+    Deep copy of `part` (and of the parts it points to) into `package`, with a
+    new partname, e.g. a chart and its embedded workbook.
+    """
+    if id(part) in copies:
+        return copies[id(part)]
+
+    partname = str(part.partname)
+    template = re.sub(r"\d*(\.\w+)$", r"%d\1", partname) if "." in partname.rsplit("/", 1)[-1] else partname + "%d"
+    new_partname = package.next_partname(template)
+
+    if isinstance(part, XmlPart):
+        new_part = type(part)(new_partname, part.content_type, package, copy.deepcopy(part._element))
     else:
-        ppt1.save('temp.pptx')
-        ppt1 = slides.Presentation('temp.pptx')
+        new_part = type(part)(new_partname, part.content_type, package, part.blob)
+    copies[id(part)] = new_part
+    return new_part
 
-        ppt2.save('temp.pptx')
-        ppt2 = slides.Presentation('temp.pptx')
 
-    for i in range(n_copies):
-        ppt1.slides.add_clone(ppt2.slides[index])
-        # ppt1.slides[-1].shapes[-1].text_frame.text = ''
-        # Lib diferente da pptx então nosso delete_shape não funciona
-        ppt1.slides[-1].shapes.remove(ppt1.slides[-1].shapes[-1])
+def _copy_rels(source, target, copies=None, nested=False):
+    """
+    Relates the part `target` to everything the part `source` points to and
+    returns the map old rId -> new rId. Images are shared inside the same deck
+    (or added once to the target deck); charts, media, OLE objects and other
+    parts are deep copied, so editing one copy does not change the others.
+    """
+    package = target.package
+    same_deck = source.package is package
+    copies = {} if copies is None else copies
+    rids = {}
+
+    for rid, rel in source.rels.items():
+        if not nested and rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+            continue  # O novo slide já tem o seu layout; as notas não são copiadas
+
+        if rel.is_external:
+            rids[rid] = target.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        elif rel.reltype in STRUCTURAL_RELS or (rel.reltype == RT.IMAGE and same_deck):
+            rids[rid] = target.relate_to(rel.target_part, rel.reltype)
+        elif rel.reltype == RT.IMAGE and not nested:
+            _, rids[rid] = target.get_or_add_image_part(io.BytesIO(rel.target_part.blob))
+        else:
+            already_copied = id(rel.target_part) in copies
+            copied = _copy_part(rel.target_part, package, copies)
+            rids[rid] = target.relate_to(copied, rel.reltype)
+            if not already_copied:
+                child_rids = _copy_rels(rel.target_part, copied, copies, nested=True)
+                if isinstance(copied, XmlPart):
+                    _remap_rids(copied._element, child_rids)
+
+    return rids
+
+
+def _remap_rids(element, rids):
+    r_ns = qn('r:id')[:-len('id')]
+    for el in element.iter():
+        for attr, value in list(el.attrib.items()):
+            if attr.startswith(r_ns) and value in rids:
+                el.set(attr, rids[value])
+
+
+def _same_layout(ppt, slide):
+    """Layout of `ppt` to use for a copy of `slide`: its own, or the one with the same name in another deck."""
+    layout = slide.slide_layout
+    if slide.part.package is ppt.part.package:
+        return layout
+    return ppt.slide_layouts.get_by_name(layout.name, ppt.slide_layouts[0])
+
+
+def clone_slide(ppt, slide):
+    """
+    Built to copy a slide to the end of a presentation, in memory
+    Parameters
+    ----------
+    ppt : Presentation type
+        presentation that receives the copy
+    slide : Slide type
+        slide to copy, from ppt or from another presentation
 
-    ppt1.save('temp.pptx', slides.export.SaveFormat.PPTX)
+    Returns
+    -------
+    the new slide
 
-    ppt = Presentation('temp.pptx')
+    """
+    _check_rels(slide.part, slide.part.package is ppt.part.package)
+    new_slide = ppt.slides.add_slide(_same_layout(ppt, slide))
 
-    for slide in ppt.slides:
-        # slide.shapes[-1].text = ''
-        delete_shape(slide, slide.shapes[-1])
+    for shape in list(new_slide.shapes):
+        delete_shape(new_slide, shape)
 
-    os.remove('temp.pptx')
+    rids = _copy_rels(slide.part, new_slide.part)
 
-    return ppt
+    tree = new_slide.shapes._spTree
+    for element in slide.shapes._spTree.iter_shape_elms():
+        new_element = copy.deepcopy(element)
+        _remap_rids(new_element, rids)
+        tree.append(new_element)
+
+    background = slide._element.cSld.bg
+    if background is not None:
+        new_background = copy.deepcopy(background)
+        _remap_rids(new_background, rids)
+        new_slide._element.cSld.insert(0, new_background)
+
+    return new_slide
+
+
+def duplicate_slides(ppt1, ppt2='same', index=-1, n_copies=1):
+    """
+    Built to copy the slide `index` of ppt2 (or of ppt1 itself) n_copies
+    times to the end of ppt1, working only on the XML tree in memory: no
+    temporary file, so concurrent runs do not collide
+    Parameters
+    ----------
+    ppt1 : Presentation type
+        presentation that receives the copies
+    ppt2 : Presentation type or 'same'
+        presentation with the slide to copy
+    index : int
+        index of the slide to copy
+    n_copies : int
+        number of copies
+
+    Returns
+    -------
+    ppt1 with the copies at the end
+
+    """
+    if ppt2 == 'same':
+        ppt2 = ppt1
+
+    slide = ppt2.slides[index]
+    for i in range(n_copies):
+        clone_slide(ppt1, slide)
+
+    return ppt1
 
 
 def search_index(ret, ppt, test_string, how='first'):
@@ -245,36 +458,32 @@ def duplicate_organize(ppt, key, qtd, dic):
 
         if pk != 1:
             lista_r += lista
-        for x in lista:
-            ppt = replace_text(ppt, key, x, 'first')
+        ppt = fill_placeholders(ppt, [(key, x) for x in lista])
     return ppt, lista_r
 
 
-df = pd.read_excel('unidades.xlsx')
-input_ = 'etiquetas.pptx'
-padrao = 11
-#  Abrindo template com lib
-ppt = Presentation(input_)
-
-linhas = len(df)
-copias = linhas // padrao
-if linhas % padrao != 0:
-    copias += 1
-keys = []
-words = []
-print(f"Duplicando o slide {copias - 1} vezes")
-ppt = duplicate_slides(ppt, n_copies=copias - 1)
-print("Cópias OK")
-print("Processo de lista")
-for index, row in df.iterrows():
-    keys.append('{nome}')
-    words.append(row['nome'])
-    keys.append('{unidade}')
-    words.append(row['unidade'])
-print("Listas OK")
-print("Processo de substituição")
-for search_string, replace_string in zip(keys, words):
-    ppt = replace_text(ppt, search_string, replace_string, how='first')
-ppt.save('etiquetas_finalizado.pptx')
-print("done!")
+if __name__ == '__main__':
+    df = pd.read_excel('unidades.xlsx')
+    input_ = 'etiquetas.pptx'
+    padrao = 11
+    #  Abrindo template com lib
+    ppt = Presentation(input_)
+
+    linhas = len(df)
+    copias = linhas // padrao
+    if linhas % padrao != 0:
+        copias += 1
+    pairs = []
+    print(f"Duplicando o slide {copias - 1} vezes")
+    ppt = duplicate_slides(ppt, n_copies=copias - 1)
+    print("Cópias OK")
+    print("Processo de lista")
+    for row in df.itertuples(index=False):
+        pairs.append(('{nome}', row.nome))
+        pairs.append(('{unidade}', row.unidade))
+    print("Listas OK")
+    print("Processo de substituição")
+    ppt = fill_placeholders(ppt, pairs)
+    ppt.save('etiquetas_finalizado.pptx')
+    print("done!")
 